@@ -0,0 +1,271 @@
+import datetime
+import heapq
+import re
+import numpy as np
+from package import parse_deadline, parse_time_of_day
+from routing import resolve_stops, nearest_order
+from truck import Truck
+
+# Patterns for the special notes column of Package_Info.csv
+TRUCK_NOTE = re.compile(r"can only be on truck\s+(\d+)", re.IGNORECASE)
+DELAYED_NOTE = re.compile(r"will not arrive to depot until\s+(\d{1,2}:\d{2})\s*([ap]m)", re.IGNORECASE)
+WRONG_ADDRESS_NOTE = re.compile(r"wrong address", re.IGNORECASE)
+GROUP_NOTE = re.compile(r"must be delivered with\s+([\d,\s]+)", re.IGNORECASE)
+
+# Number of nearest locations each unit considers when building savings pairs, and how many units at each
+# of those locations it is paired with. Limiting the candidates keeps the savings list at O(n * k) instead of O(n^2)
+SAVINGS_NEIGHBORS = 20
+UNITS_PER_NEIGHBOR = 4
+# Number of distance matrix rows pulled into memory at once while searching for nearest units
+NEIGHBOR_BLOCK_SIZE = 1024
+END_OF_DAY = datetime.timedelta(hours=24)
+
+
+class PackageConstraints:
+    def __init__(self, required_truck=None, available_time=None, wrong_address=False, delivered_with=()):
+        # Holds the loading restrictions parsed from a package's special notes
+        self.required_truck = required_truck  # 1-based truck number the package must ride on
+        self.available_time = available_time  # Time the package arrives at the hub, None if already there
+        self.wrong_address = wrong_address  # The listed address is wrong until a correction is received
+        self.delivered_with = tuple(delivered_with)  # Package IDs that must share a truck with this one
+
+
+# Function to parse a package's special notes into loading restrictions
+def parse_special_notes(notes):
+    constraints = PackageConstraints()
+    if not notes:
+        return constraints
+    match = TRUCK_NOTE.search(notes)
+    if match:
+        constraints.required_truck = int(match.group(1))
+    match = DELAYED_NOTE.search(notes)
+    if match:
+        constraints.available_time = parse_time_of_day(f"{match.group(1)} {match.group(2)}")
+    if WRONG_ADDRESS_NOTE.search(notes):
+        constraints.wrong_address = True
+    match = GROUP_NOTE.search(notes)
+    if match:
+        constraints.delivered_with = tuple(int(part) for part in match.group(1).replace(",", " ").split())
+    return constraints
+
+
+class DeliveryUnit:
+    def __init__(self, package_ids):
+        # A set of packages that must be loaded together, built from the "must be delivered with" notes
+        self.package_ids = package_ids
+        self.required_truck = None
+        self.release_time = datetime.timedelta(0)  # Earliest time every package in the unit can leave the hub
+        self.deadline = END_OF_DAY  # Earliest deadline of any package in the unit
+        self.location_index = None  # Matrix index that represents the unit when clustering
+
+
+# Function to merge packages that must travel together into delivery units with a union-find structure
+def build_units(package_ids, package_hash_map, address_to_index, address_known_time):
+    parent = {package_id: package_id for package_id in package_ids}
+
+    def find(package_id):
+        while parent[package_id] != package_id:
+            parent[package_id] = parent[parent[package_id]]  # Path halving keeps the trees shallow
+            package_id = parent[package_id]
+        return package_id
+
+    constraints = {}
+    for package_id in package_ids:
+        package = package_hash_map.lookup(package_id)
+        constraints[package_id] = parse_special_notes(package.special_notes)
+        for other_id in constraints[package_id].delivered_with:
+            if other_id in parent:
+                parent[find(package_id)] = find(other_id)
+
+    members = {}
+    for package_id in package_ids:
+        members.setdefault(find(package_id), []).append(package_id)
+
+    units = []
+    for group in members.values():
+        unit = DeliveryUnit(group)
+        for package_id in group:
+            package = package_hash_map.lookup(package_id)
+            rule = constraints[package_id]
+            if rule.required_truck is not None:
+                if unit.required_truck not in (None, rule.required_truck):
+                    raise ValueError(f"Packages {group} must travel together but are restricted to different trucks")
+                unit.required_truck = rule.required_truck
+            if rule.available_time is not None:
+                unit.release_time = max(unit.release_time, rule.available_time)
+            if rule.wrong_address and address_known_time is not None:
+                unit.release_time = max(unit.release_time, address_known_time)
+            deadline = parse_deadline(package.delivery_deadline)
+            if deadline is not None:
+                unit.deadline = min(unit.deadline, deadline)
+            if unit.location_index is None:
+                unit.location_index = address_to_index[package.delivery_address]
+        units.append(unit)
+    return units
+
+
+# Function to find the nearest neighbors of every location in blocks of matrix rows
+# Returns an (n, k) array of positions into locations, excluding each location itself
+def nearest_neighbors(locations, distance_matrix, k):
+    count = len(locations)
+    k = min(k, count - 1)
+    neighbors = np.empty((count, k), dtype=np.intp)
+    if k <= 0:
+        return neighbors
+    for start in range(0, count, NEIGHBOR_BLOCK_SIZE):
+        block = locations[start:start + NEIGHBOR_BLOCK_SIZE]
+        rows = np.array(distance_matrix[np.ix_(block, locations)], dtype=np.float64)
+        rows[np.arange(len(block)), np.arange(start, start + len(block))] = np.inf  # Skip each unit itself
+        neighbors[start:start + len(block)] = np.argpartition(rows, k - 1, axis=1)[:, :k]
+    return neighbors
+
+
+# Function to list the unit pairs that savings merging considers
+# Neighbors are searched between distinct locations only, since many units usually share an address. Units at the
+# same location are chained to each other, and each unit is paired with a few units at each nearby location.
+def candidate_pairs(locations, distance_matrix):
+    unique_locations, location_of = np.unique(locations, return_inverse=True)
+    by_location = np.argsort(location_of, kind="stable")  # Unit positions grouped by location
+    counts = np.bincount(location_of, minlength=len(unique_locations))
+    starts = np.concatenate(([0], np.cumsum(counts)[:-1]))
+
+    # Consecutive units at the same location
+    shared = location_of[by_location[1:]] == location_of[by_location[:-1]]
+    firsts, seconds = [by_location[:-1][shared]], [by_location[1:][shared]]
+
+    neighbors = nearest_neighbors(unique_locations, distance_matrix, SAVINGS_NEIGHBORS)
+    unit_neighbors = neighbors[location_of]  # (units, k) neighboring locations of every unit
+    unit_positions = np.repeat(np.arange(len(locations)), unit_neighbors.shape[1])
+    neighbor_locations = unit_neighbors.ravel()
+    for rank in range(UNITS_PER_NEIGHBOR):
+        valid = counts[neighbor_locations] > rank
+        firsts.append(unit_positions[valid])
+        seconds.append(by_location[starts[neighbor_locations[valid]] + rank])
+    return np.concatenate(firsts), np.concatenate(seconds)
+
+
+# Function to group units into capacity-limited clusters with the Clarke-Wright savings heuristic
+# Only the nearest neighbors of each unit are considered as merge candidates, so large manifests stay fast
+def savings_clusters(units, hub_index, distance_matrix, capacity):
+    count = len(units)
+    if count == 0:
+        return []
+    locations = np.array([unit.location_index for unit in units], dtype=np.intp)
+    sizes = [len(unit.package_ids) for unit in units]
+    first, second = candidate_pairs(locations, distance_matrix)
+
+    # Savings of serving i and j on one trip instead of two: d(hub, i) + d(hub, j) - d(i, j)
+    hub_distance = np.asarray(distance_matrix[hub_index, locations], dtype=np.float64)
+    pair_distance = np.asarray(distance_matrix[locations[first], locations[second]], dtype=np.float64)
+    savings = hub_distance[first] + hub_distance[second] - pair_distance
+    ranked = np.argsort(-savings, kind="stable")
+
+    # Every unit starts on its own route; routes are merged end to end while capacity allows
+    route_of = list(range(count))
+    routes = {i: [i] for i in range(count)}
+    loads = {i: sizes[i] for i in range(count)}
+    for pair in ranked:
+        i, j = int(first[pair]), int(second[pair])
+        route_i, route_j = route_of[i], route_of[j]
+        if route_i == route_j or loads[route_i] + loads[route_j] > capacity:
+            continue
+        chain_i, chain_j = routes[route_i], routes[route_j]
+        # Units can only be joined where they sit at the end of their routes
+        if chain_i[-1] == i and chain_j[0] == j:
+            merged = chain_i + chain_j
+        elif chain_i[0] == i and chain_j[-1] == j:
+            merged = chain_j + chain_i
+        elif chain_i[-1] == i and chain_j[-1] == j:
+            merged = chain_i + chain_j[::-1]
+        elif chain_i[0] == i and chain_j[0] == j:
+            merged = chain_i[::-1] + chain_j
+        else:
+            continue
+        routes[route_i] = merged
+        loads[route_i] += loads.pop(route_j)
+        del routes[route_j]
+        for unit_position in chain_j:
+            route_of[unit_position] = route_i
+
+    return [[units[position] for position in chain] for chain in routes.values()]
+
+
+# Function to estimate how long a trip keeps a truck away from the hub, including the drive back
+def trip_duration(truck, package_ids, package_hash_map, address_to_index, distance_matrix):
+    hub_index = address_to_index[truck.current_location]
+    stop_indices, _ = resolve_stops(package_ids, package_hash_map, address_to_index)
+    order = nearest_order(hub_index, stop_indices, distance_matrix)
+    path = [hub_index] + [int(stop_indices[position]) for position in order] + [hub_index]
+    miles = sum(distance_matrix[path[k - 1], path[k]] for k in range(1, len(path)))
+    return datetime.timedelta(hours=miles / truck.avg_speed)
+
+
+# This function partitions packages across a fleet of trucks and multiple trips per truck
+# Units are clustered per (required truck, release time) class with savings-based merging, then clusters are
+# dispatched in deadline order to whichever truck and driver are free first. Each trip is returned as a Truck
+# object carrying its packages and departure time, ready to be routed with nearest_algo.
+def assign_packages(trucks, package_ids, package_hash_map, address_to_index, distance_matrix,
+                    driver_count=None, address_known_time=None):
+    if not trucks:
+        raise ValueError("At least one truck is required to assign packages")
+    hub_index = address_to_index[trucks[0].current_location]
+    capacity = min(truck.max_capacity for truck in trucks)
+    units = build_units(list(package_ids), package_hash_map, address_to_index, address_known_time)
+
+    classes = {}
+    for unit in units:
+        if len(unit.package_ids) > capacity:
+            raise ValueError(f"Packages {unit.package_ids} must travel together but exceed truck capacity")
+        if unit.required_truck is not None and not 1 <= unit.required_truck <= len(trucks):
+            raise ValueError(f"Packages {unit.package_ids} require truck {unit.required_truck}, "
+                             f"but only {len(trucks)} trucks are available")
+        classes.setdefault((unit.required_truck, unit.release_time), []).append(unit)
+
+    clusters = []
+    for (required_truck, release_time), class_units in classes.items():
+        for cluster in savings_clusters(class_units, hub_index, distance_matrix, capacity):
+            deadline = min(unit.deadline for unit in cluster)
+            package_list = [package_id for unit in cluster for package_id in unit.package_ids]
+            clusters.append((deadline, release_time, required_truck, package_list))
+    # The most urgent clusters are dispatched first
+    clusters.sort(key=lambda cluster: (cluster[0], cluster[1], cluster[3][0]))
+
+    # Min-heaps of the times each truck and driver become free
+    truck_free = [(truck.departure_time, position) for position, truck in enumerate(trucks)]
+    heapq.heapify(truck_free)
+    truck_available = [truck.departure_time for truck in trucks]
+    drivers = None
+    if driver_count is not None:
+        drivers = [min(truck.departure_time for truck in trucks)] * driver_count
+
+    trips = []
+    trip_counts = [0] * len(trucks)
+    for deadline, release_time, required_truck, package_list in clusters:
+        if required_truck is not None:
+            position = required_truck - 1
+            free_at = truck_available[position]
+        else:
+            # Skip heap entries that are stale because a required-truck trip moved that truck's free time
+            while truck_free[0][0] != truck_available[truck_free[0][1]]:
+                heapq.heappop(truck_free)
+            free_at, position = heapq.heappop(truck_free)
+        truck = trucks[position]
+
+        departure_time = max(free_at, release_time)
+        if drivers is not None:
+            departure_time = max(departure_time, heapq.heappop(drivers))
+        trip_counts[position] += 1
+        trip = Truck(truck.max_capacity, truck.avg_speed, 0, truck.current_location, departure_time, package_list,
+                     truck.truck_name)
+        trip.trip_number = trip_counts[position]
+        trips.append(trip)
+
+        returned_at = departure_time + trip_duration(trip, package_list, package_hash_map, address_to_index,
+                                                     distance_matrix)
+        truck_available[position] = returned_at
+        heapq.heappush(truck_free, (returned_at, position))
+        if drivers is not None:
+            heapq.heappush(drivers, returned_at)
+
+    trips.sort(key=lambda trip: (trip.departure_time, trip.truck_name))
+    return trips
@@ -0,0 +1,245 @@
+# Benchmark harness for the routing pipeline
+# Generates synthetic address networks and package manifests in the same CSV formats as the files in CSV/,
+# then times each pipeline stage and writes the results as JSON so runs can be compared across versions.
+#
+# Usage: python benchmark.py --packages 100 1000 10000 --output results.json
+
+import argparse
+import datetime
+import json
+import multiprocessing
+import os
+import platform
+import random
+import subprocess
+import tempfile
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+try:
+    import resource
+except ImportError:  # resource is only available on Unix
+    resource = None
+from assignment import assign_packages
+from data_loader import create_distance_matrix, create_address_map, load_package
+from deadline_routing import deadline_nearest_algo
+from hash import HashMap
+from package import parse_deadline
+from routing import nearest_algo, vectorized_nearest_algo
+from shortest_paths import shortest_path_closure
+from timeline import StatusTimeline
+from truck import Truck
+
+HUB_ADDRESS = "4001 South 700 East"
+# Side length in miles of the square the synthetic addresses are scattered over
+NETWORK_SIZE_MILES = 20.0
+DEFAULT_MAX_ADDRESSES = 1000
+TRUCK_CAPACITY = 16
+TRUCK_SPEED = 18
+DEPARTURE_TIME = datetime.timedelta(hours=8)
+DEADLINES = (("9:00 AM", 0.05), ("10:30 AM", 0.25), ("EOD", 0.70))
+# Special notes and the share of packages that carry each one
+NOTES = (("'Can only be on truck 2'", 0.02),
+         ("'Delayed on flight---will not arrive to depot until 9:05 am'", 0.03))
+
+
+# Function to write a synthetic address network and manifest in the formats the loaders consume
+# Returns the paths of the distance, address and package files
+def generate_instance(directory, package_count, address_count, seed=0):
+    rng = random.Random(seed)
+    points = np.random.default_rng(seed).random((address_count, 2)) * NETWORK_SIZE_MILES
+    distance_path = os.path.join(directory, "Address_Distance_Info.csv")
+    address_path = os.path.join(directory, "Address_Info.csv")
+    package_path = os.path.join(directory, "Package_Info.csv")
+
+    # Lower-triangular distance rows, rounded to a tenth of a mile like the sample data
+    with open(distance_path, mode='w') as distance_file:
+        for i in range(address_count):
+            row = np.sqrt(((points[:i + 1] - points[i]) ** 2).sum(axis=1))
+            row = np.maximum(np.round(row, 1), 0.1)  # Distinct addresses are never zero miles apart
+            row[i] = 0.0
+            distance_file.write(",".join(f"{value:g}" for value in row) + "\n")
+
+    streets = [HUB_ADDRESS] + [f"{100 + i} Synthetic Ave" for i in range(1, address_count)]
+    with open(address_path, mode='w') as address_file:
+        for i, street in enumerate(streets):
+            address_file.write(f"{i},Location {i},{street}\n")
+
+    deadline_labels = [label for label, _ in DEADLINES]
+    deadline_weights = [weight for _, weight in DEADLINES]
+    with open(package_path, mode='w') as package_file:
+        for package_id in range(1, package_count + 1):
+            street = streets[rng.randrange(1, address_count)] if address_count > 1 else streets[0]
+            deadline = rng.choices(deadline_labels, deadline_weights)[0]
+            row = f"{package_id},{street},Salt Lake City,UT,84115,{deadline},{rng.randint(1, 88)} Kilos"
+            draw = rng.random()
+            for note, share in NOTES:
+                if draw < share:
+                    row += f",{note}"
+                    break
+                draw -= share
+            package_file.write(row + "\n")
+    return distance_path, address_path, package_path
+
+
+# Function to read the process's peak resident memory in bytes, None where the platform does not report it
+# Tracing allocations would slow the stages down several times over, so the high-water mark is used instead. Every
+# manifest size runs in its own process, so the mark only covers that size's stages.
+def peak_memory_bytes():
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == "darwin" else peak * 1024  # Linux reports kilobytes, macOS bytes
+
+
+# Function to read the process's current resident memory in bytes, None where /proc is not available
+def resident_memory_bytes():
+    try:
+        with open("/proc/self/statm") as statm_file:
+            return int(statm_file.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError):
+        return None
+
+
+# Function to subtract two memory readings that may be None
+def memory_delta(before, after):
+    return None if before is None or after is None else after - before
+
+
+# Function to run a stage while measuring its wall time and memory
+# Records the process's peak memory once the stage finishes, how much the stage raised that peak, and how much
+# resident memory the stage left allocated, so stages can be told apart even after an earlier one set the peak
+def measure(stages, name, function):
+    peak_before, resident_before = peak_memory_bytes(), resident_memory_bytes()
+    start = time.perf_counter()
+    result = function()
+    wall = time.perf_counter() - start
+    peak_after = peak_memory_bytes()
+    stages[name] = {"wall_seconds": round(wall, 6), "peak_memory_bytes": peak_after,
+                    "peak_growth_bytes": memory_delta(peak_before, peak_after),
+                    "rss_delta_bytes": memory_delta(resident_before, resident_memory_bytes())}
+    return result
+
+
+# Function to run the whole pipeline on one generated instance and collect per-stage measurements
+def run_pipeline(directory, package_count, address_count, truck_count, query_count, seed, legacy_routing,
+                 deadline_routing=False, shortest_paths=False):
+    stages = {}
+    paths = measure(stages, "generate", lambda: generate_instance(directory, package_count, address_count, seed))
+    distance_path, address_path, package_path = paths
+
+    distance_matrix = measure(stages, "load_distances", lambda: create_distance_matrix(distance_path))
+    if shortest_paths:
+        closure = measure(stages, "shortest_paths", lambda: shortest_path_closure(distance_matrix))
+        distance_matrix = closure.distance_matrix
+    _, address_to_index = measure(stages, "load_addresses", lambda: create_address_map(address_path))
+    package_hash_map = HashMap()
+    measure(stages, "load_packages", lambda: load_package(package_path, package_hash_map))
+
+    trucks = [Truck(TRUCK_CAPACITY, TRUCK_SPEED, 0, HUB_ADDRESS, DEPARTURE_TIME, [], f"Truck {number}")
+              for number in range(1, truck_count + 1)]
+    trips = measure(stages, "assignment",
+                    lambda: assign_packages(trucks, range(1, package_count + 1), package_hash_map, address_to_index,
+                                            distance_matrix))
+
+    if legacy_routing:
+        # The original dictionary based nearest neighbor loop, kept to track the speedup of the vectorized engine
+        legacy_trips = [Truck(trip.max_capacity, trip.avg_speed, 0, trip.current_location, trip.departure_time,
+                              trip.initial_packages, trip.truck_name) for trip in trips]
+        legacy = measure(stages, "nearest_algo",
+                         lambda: [nearest_algo(trip, package_hash_map, address_to_index, distance_matrix)
+                                  for trip in legacy_trips])
+        stages["nearest_algo"]["total_mileage"] = round(float(sum(mileage for mileage, _ in legacy)), 3)
+    if deadline_routing:
+        routed = measure(stages, "deadline_nearest_algo",
+                         lambda: [deadline_nearest_algo(trip, package_hash_map, address_to_index, distance_matrix)[:2]
+                                  for trip in trips])
+    else:
+        routed = measure(stages, "vectorized_nearest_algo",
+                         lambda: [vectorized_nearest_algo(trip, package_hash_map, address_to_index, distance_matrix)
+                                  for trip in trips])
+    total_mileage = float(sum(mileage for mileage, _ in routed))
+
+    timeline = measure(stages, "build_timeline", lambda: StatusTimeline(package_hash_map.values()))
+    query_rng = random.Random(seed)
+    query_times = [datetime.timedelta(minutes=query_rng.randrange(8 * 60, 18 * 60)) for _ in range(query_count)]
+    measure(stages, "status_counts_queries", lambda: [timeline.status_counts(moment) for moment in query_times])
+    # Full status reports are far more expensive, so only a handful are timed
+    measure(stages, "status_report_queries", lambda: [timeline.report(moment) for moment in query_times[:5]])
+
+    deadlines = ((package, parse_deadline(package.delivery_deadline)) for package in package_hash_map.values())
+    late = sum(1 for package, deadline in deadlines
+               if deadline is not None and package.delivery_time is not None and package.delivery_time > deadline)
+    return {
+        "packages": package_count,
+        "addresses": address_count,
+        "trucks": truck_count,
+        "trips": len(trips),
+        "total_mileage": round(total_mileage, 3),
+        "late_packages": late,
+        "stages": stages,
+    }
+
+
+# Function to generate and benchmark one manifest size in a temporary directory
+def run_size(package_count, address_count, truck_count, query_count, seed, legacy_routing, deadline_routing,
+             shortest_paths):
+    with tempfile.TemporaryDirectory() as directory:
+        return run_pipeline(directory, package_count, address_count, truck_count, query_count, seed, legacy_routing,
+                            deadline_routing, shortest_paths)
+
+
+# Function to describe the code version being measured, so results from different commits can be compared
+def code_version():
+    try:
+        return subprocess.run(["git", "describe", "--always", "--dirty"], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__)), check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the package routing pipeline on synthetic data")
+    parser.add_argument("--packages", type=int, nargs="+", default=[100, 1000, 10000],
+                        help="manifest sizes to benchmark (default: 100 1000 10000)")
+    parser.add_argument("--addresses", type=int, default=None,
+                        help=f"addresses per network (default: packages, capped at {DEFAULT_MAX_ADDRESSES})")
+    parser.add_argument("--trucks", type=int, default=None,
+                        help="trucks in the fleet (default: one per 160 packages, at least 3)")
+    parser.add_argument("--queries", type=int, default=1000, help="status count queries to time")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--legacy-routing", action="store_true", help="also time the original nearest_algo loop")
+    parser.add_argument("--deadline-routing", action="store_true",
+                        help="route the trips with the deadline-aware engine instead of plain nearest neighbor")
+    parser.add_argument("--shortest-paths", action="store_true",
+                        help="route on the shortest path closure of the generated distances")
+    parser.add_argument("--output", help="write the JSON results to this file instead of stdout")
+    args = parser.parse_args()
+
+    results = {
+        "version": code_version(),
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "timestamp": datetime.datetime.now(datetime.timezone.utc).isoformat(timespec="seconds"),
+        "runs": [],
+    }
+    for package_count in args.packages:
+        address_count = args.addresses or min(package_count, DEFAULT_MAX_ADDRESSES)
+        truck_count = args.trucks or max(3, package_count // 160)
+        # A fresh process per size, so memory left over from a smaller run never shows up in a larger one's stages
+        with ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context("spawn")) as pool:
+            results["runs"].append(pool.submit(run_size, package_count, address_count, truck_count, args.queries,
+                                               args.seed, args.legacy_routing, args.deadline_routing,
+                                               args.shortest_paths).result())
+
+    report = json.dumps(results, indent=2)
+    if args.output:
+        with open(args.output, mode='w') as output_file:
+            output_file.write(report + "\n")
+    else:
+        print(report)
+
+
+if __name__ == "__main__":
+    main()
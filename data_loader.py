@@ -0,0 +1,68 @@
+import csv
+import numpy as np
+from package import Package
+
+
+# Function to read data from a CSV file
+# Returns a list of list, where each sub-list represents a row in the file
+def read_csv_data(file_path):
+    with open(file_path, mode='r') as csvfile:
+        reader = csv.reader(csvfile)
+        return [row for row in reader]
+
+
+# Function to create a distance Matrix from the CSV data
+def create_distance_matrix(distance_path):
+    lower_data = read_csv_data(distance_path)
+    size = len(lower_data)  # Determine the size of the matrix
+    full_matrix = np.zeros((size, size))  # Initialize a square matrix filled with zeros
+
+    for i in range(size):
+        for j in range(i + 1):  # Fill in the distance matrix
+            distance = float(lower_data[i][j]) if lower_data[i][j] else 0.0  # Convert distance to float
+            full_matrix[i, j] = full_matrix[j, i] = distance  # Mirror the distances to maintain symmetry
+
+    return full_matrix
+
+
+# Function to create mappings from address/location descriptions to its matrix index
+def create_address_map(address_path):
+    address_data = read_csv_data(address_path)
+    # Create a map from location descriptions to their matrix indices
+    location_to_index = {row[1].strip(): int(row[0]) for row in address_data}
+    # Create a map from addresses to their matrix indices
+    address_to_index = {row[2].strip(): int(row[0]) for row in address_data}
+    return location_to_index, address_to_index
+
+
+# Function to find the distance between two addresses
+def get_distance(address1, address2, address_index_map, distance_matrix):
+    index1 = address_index_map[address1]  # Retrieve the matrix index for the first address
+    index2 = address_index_map[address2]  # Retrieve the matrix index for the second address
+    if index1 is not None and index2 is not None:
+        # Return the distance from the matrix if both indices are found
+        return distance_matrix[index1][index2]
+    else:
+        return None
+
+
+# Function to load package data from CSV into the hash table
+def load_package(package_path, package_hash_table):
+    package_data = read_csv_data(package_path)
+    for package in package_data:
+        package_id = int(package[0])  # Extract the package ID and convert it to an integer
+        # Create a new package instance with the extracted data
+        new_package = Package(
+            package_id,
+            package[1].strip(),
+            package[2].strip(),
+            package[3].strip(),
+            package[4].strip(),
+            package[5].strip(),
+            package[6].strip(),
+            "At Hub",  # Initial status set to "At Hub"
+            # Rejoin the special notes since csv.reader splits notes such as 'Must be delivered with 15, 19'
+            ",".join(package[7:]).strip().strip("'")
+        )
+        # Insert the new package into the hash table with package_id as the key
+        package_hash_table.insert(package_id, new_package)
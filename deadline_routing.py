@@ -0,0 +1,304 @@
+import datetime
+import time
+import numpy as np
+from distance_cache import as_distance_array
+from package import parse_deadline
+from routing import resolve_stops, apply_route
+
+# A stop with a deadline is visited next when detouring to the nearest stop first would leave it less slack than this
+URGENCY_MARGIN_SECONDS = 10 * 60
+# Repairs that keep the number of late stops must cut the total lateness by more than this many seconds
+LATENESS_EPSILON = 1e-6
+
+
+class IndexedPriorityQueue:
+    def __init__(self):
+        # Binary min-heap of (priority, item) with the heap position of every item, so any item can be
+        # removed or re-prioritized in O(log n) instead of rescanning the queue
+        self.heap = []
+        self.positions = {}
+
+    def __len__(self):
+        return len(self.heap)
+
+    def __contains__(self, item):
+        return item in self.positions
+
+    def push(self, item, priority):
+        # Adds an item, or changes the priority of an item already in the queue
+        if item in self.positions:
+            position = self.positions[item]
+            old_priority = self.heap[position][0]
+            self.heap[position] = (priority, item)
+            if priority < old_priority:
+                self.sift_up(position)
+            else:
+                self.sift_down(position)
+            return
+        self.heap.append((priority, item))
+        self.positions[item] = len(self.heap) - 1
+        self.sift_up(len(self.heap) - 1)
+
+    def peek(self):
+        # Returns the (item, priority) with the lowest priority without removing it
+        priority, item = self.heap[0]
+        return item, priority
+
+    def pop(self):
+        item, priority = self.peek()
+        self.remove(item)
+        return item, priority
+
+    def remove(self, item):
+        # Moves the last entry into the removed item's slot and restores the heap order around it
+        position = self.positions.pop(item)
+        last = self.heap.pop()
+        if position < len(self.heap):
+            self.heap[position] = last
+            self.positions[last[1]] = position
+            self.sift_up(position)
+            self.sift_down(self.positions[last[1]])
+
+    def swap(self, i, j):
+        self.heap[i], self.heap[j] = self.heap[j], self.heap[i]
+        self.positions[self.heap[i][1]] = i
+        self.positions[self.heap[j][1]] = j
+
+    def sift_up(self, position):
+        while position > 0:
+            parent = (position - 1) // 2
+            if self.heap[position] >= self.heap[parent]:
+                break
+            self.swap(position, parent)
+            position = parent
+
+    def sift_down(self, position):
+        size = len(self.heap)
+        while True:
+            smallest = position
+            for child in (2 * position + 1, 2 * position + 2):
+                if child < size and self.heap[child] < self.heap[smallest]:
+                    smallest = child
+            if smallest == position:
+                break
+            self.swap(position, smallest)
+            position = smallest
+
+
+class LatePackage:
+    def __init__(self, package_id, deadline, delivery_time):
+        # A package delivered after its deadline
+        self.package_id = package_id
+        self.deadline = deadline
+        self.delivery_time = delivery_time
+        self.lateness = delivery_time - deadline
+
+    def __str__(self):
+        return f"Package ID {self.package_id} delivered {self.lateness} after its {self.deadline} deadline"
+
+
+class LatenessReport:
+    def __init__(self, truck_name, late_packages, repair_moves=0):
+        # Deadline performance of one routed truck
+        self.truck_name = truck_name
+        self.late_packages = late_packages
+        self.repair_moves = repair_moves  # Stops moved earlier to repair missed deadlines
+
+    @property
+    def on_time(self):
+        return not self.late_packages
+
+    @property
+    def total_lateness(self):
+        return sum((late.lateness for late in self.late_packages), datetime.timedelta())
+
+    @property
+    def max_lateness(self):
+        return max((late.lateness for late in self.late_packages), default=datetime.timedelta())
+
+
+# Function to check every package of a routed truck against its deadline
+# Works for trucks routed by any engine, so the deadline mode can be compared against plain nearest neighbor
+def lateness_report(truck, package_hash_map, repair_moves=0):
+    late_packages = []
+    for package_id in truck.route:
+        package = package_hash_map.lookup(package_id)
+        deadline = parse_deadline(package.delivery_deadline)
+        if deadline is not None and package.delivery_time is not None and package.delivery_time > deadline:
+            late_packages.append(LatePackage(package_id, deadline, package.delivery_time))
+    return LatenessReport(truck.truck_name, late_packages, repair_moves)
+
+
+# Function to compute the earliest deadline of each stop in seconds since midnight, infinity for end of day
+def stop_deadline_seconds(stop_packages):
+    deadlines = np.full(len(stop_packages), np.inf)
+    for position, packages in enumerate(stop_packages):
+        for package in packages:
+            deadline = parse_deadline(package.delivery_deadline)
+            if deadline is not None:
+                deadlines[position] = min(deadlines[position], deadline.total_seconds())
+    return deadlines
+
+
+# Function to project the arrival time at every stop of an ordered route, and the route's mileage
+def projected_arrivals(start_index, start_seconds, seconds_per_mile, stop_indices, order, distance):
+    path = np.concatenate(([start_index], stop_indices[order])).astype(np.intp)
+    legs = np.asarray(distance[path[:-1], path[1:]], dtype=np.float64)
+    miles = np.cumsum(legs)
+    return start_seconds + miles * seconds_per_mile, float(miles[-1]) if len(miles) else 0.0
+
+
+# Function to order stops by nearest neighbor while protecting deadlines
+# Stops with a deadline wait in an indexed priority queue keyed on the deadline. Each step picks the nearest
+# stop with one vectorized argmin, then checks the slack the most urgent stop would have left after that detour.
+# When the slack drops below urgency_margin seconds and the urgent stop can still be reached on time, the truck
+# goes there instead. Visited stops leave the queue in O(log n), so no step rescans the pending deadlines.
+def deadline_order(start_index, start_seconds, seconds_per_mile, stop_indices, stop_deadlines, distance_matrix,
+                   urgency_margin=URGENCY_MARGIN_SECONDS):
+    stop_count = len(stop_indices)
+    order = np.empty(stop_count, dtype=np.intp)
+    distance = as_distance_array(distance_matrix)
+    stop_matrix = np.asarray(distance[np.ix_(stop_indices, stop_indices)], dtype=np.float64)
+    remaining = np.array(distance[start_index, stop_indices], dtype=np.float64)
+    visited = np.zeros(stop_count, dtype=bool)
+
+    pending = IndexedPriorityQueue()
+    for position in np.flatnonzero(np.isfinite(stop_deadlines)):
+        pending.push(int(position), float(stop_deadlines[position]))
+
+    clock = start_seconds
+    for step in range(stop_count):
+        choice = int(np.argmin(remaining))
+        # Deadlines that can no longer be met stop competing with the ones that still can
+        while pending and clock + remaining[pending.peek()[0]] * seconds_per_mile > pending.peek()[1]:
+            pending.pop()
+        if pending:
+            urgent, deadline = pending.peek()
+            if urgent != choice:
+                detour = clock + (remaining[choice] + stop_matrix[choice, urgent]) * seconds_per_mile
+                if deadline - detour < urgency_margin:
+                    choice = urgent
+        order[step] = choice
+        clock += remaining[choice] * seconds_per_mile
+        if choice in pending:
+            pending.remove(choice)
+        visited[choice] = True
+        remaining = np.where(visited, np.inf, stop_matrix[choice])
+    return order
+
+
+# Function to score an order as (late stops, total lateness in seconds, mileage), lower is better
+def route_lateness(order, start_index, start_seconds, seconds_per_mile, stop_indices, stop_deadlines, distance):
+    arrivals, miles = projected_arrivals(start_index, start_seconds, seconds_per_mile, stop_indices, order, distance)
+    lateness = np.maximum(arrivals - stop_deadlines[order], 0.0)
+    return int(np.count_nonzero(lateness)), float(lateness.sum()), miles
+
+
+# Function to score moving the stop at late_position to every earlier position without rebuilding the route
+# Stops before the target keep their arrivals, stops from the target up to the old position all shift by the detour
+# through the moved stop, and every stop after the old position shifts by that detour plus the time saved by taking
+# the stop out. Returns the late stop counts, total lateness and mileage of each candidate, indexed by target.
+def insertion_scores(order, arrivals, miles, late_position, start_index, start_seconds, seconds_per_mile,
+                     stop_indices, stop_deadlines, distance):
+    path = np.concatenate(([start_index], stop_indices[order])).astype(np.intp)  # path[i + 1] is order[i]
+    deadlines = stop_deadlines[order]
+    lateness = np.maximum(arrivals - deadlines, 0.0)
+    targets = np.arange(late_position)
+    moved = path[late_position + 1]
+    previous, following = path[targets], path[targets + 1]
+
+    to_moved = np.asarray(distance[previous, moved], dtype=np.float64)
+    detour = to_moved + np.asarray(distance[moved, following] - distance[previous, following], dtype=np.float64)
+    before = np.concatenate(([start_seconds], arrivals[:late_position - 1]))  # Arrival at each target's predecessor
+    moved_lateness = np.maximum(before + to_moved * seconds_per_mile - deadlines[late_position], 0.0)
+
+    # Stops between the target and the old position, masked to the ones at or after each target
+    shift = detour * seconds_per_mile
+    segment = np.maximum(arrivals[:late_position] + shift[:, None] - deadlines[:late_position], 0.0)
+    segment[targets[None, :] < targets[:, None]] = 0.0
+
+    # Stops after the old position, all shifted by the same amount for a given target
+    prior = path[late_position]
+    if late_position + 1 < len(order):
+        after = path[late_position + 2]
+        removal = float(distance[prior, after]) - float(distance[prior, moved]) - float(distance[moved, after])
+    else:
+        removal = -float(distance[prior, moved])
+    suffix_shift = shift + removal * seconds_per_mile
+    suffix = np.maximum(arrivals[late_position + 1:] + suffix_shift[:, None] - deadlines[late_position + 1:], 0.0)
+
+    prefix_late = np.concatenate(([0], np.cumsum(lateness > 0)))[targets]
+    prefix_lateness = np.concatenate(([0.0], np.cumsum(lateness)))[targets]
+    late_counts = (prefix_late + (moved_lateness > 0) + np.count_nonzero(segment, axis=1)
+                   + np.count_nonzero(suffix, axis=1))
+    total_lateness = prefix_lateness + moved_lateness + segment.sum(axis=1) + suffix.sum(axis=1)
+    return late_counts, total_lateness, miles + detour + removal
+
+
+# Function to repair an order whose projected arrivals miss deadlines
+# Late stops that could not be reached on time even as the first stop are left alone. Each other late stop in
+# turn is scored at every earlier position with insertion_scores, and the first late stop that can be moved somewhere
+# that lowers the route's score is moved to its best position. This repeats until every deadline is met, no
+# late stop can be helped, or the move budget (one per stop by default) or the time budget (seconds) runs out.
+# Returns the order and the number of moves made.
+def repair_order(order, start_index, start_seconds, seconds_per_mile, stop_indices, stop_deadlines, distance,
+                 max_moves=None, time_limit=None):
+    moves = 0
+    max_moves = len(order) if max_moves is None else max_moves
+    deadline = None if time_limit is None else time.perf_counter() + time_limit
+    direct = start_seconds + np.asarray(distance[start_index, stop_indices], dtype=np.float64) * seconds_per_mile
+    reachable = direct <= stop_deadlines
+    while moves < max_moves and (deadline is None or time.perf_counter() < deadline):
+        arrivals, miles = projected_arrivals(start_index, start_seconds, seconds_per_mile, stop_indices, order,
+                                             distance)
+        lateness = np.maximum(arrivals - stop_deadlines[order], 0.0)
+        late_positions = np.flatnonzero((lateness > 0) & reachable[order])
+        current_key = (int(np.count_nonzero(lateness)), float(lateness.sum()) - LATENESS_EPSILON, miles)
+
+        best_order = None
+        for late_position in late_positions:
+            if late_position == 0:
+                continue
+            late_counts, total_lateness, candidate_miles = insertion_scores(
+                order, arrivals, miles, late_position, start_index, start_seconds, seconds_per_mile, stop_indices,
+                stop_deadlines, distance)
+            target = int(np.lexsort((candidate_miles, total_lateness, late_counts))[0])
+            key = (int(late_counts[target]), float(total_lateness[target]), float(candidate_miles[target]))
+            if key < current_key:
+                best_order = np.insert(np.delete(order, late_position), target, order[late_position])
+                break
+        if best_order is None:
+            break
+        order = best_order
+        moves += 1
+    return order, moves
+
+
+# This function routes a truck with deadline-aware nearest neighbor ordering
+# Returns the truck's total mileage, the last delivery time and a LatenessReport. With reject_late=True a route
+# that still misses a deadline after repair raises ValueError before the truck or its packages are modified.
+# repair_max_moves and repair_time_limit bound the deadline repair the same way repair_order's budgets do.
+def deadline_nearest_algo(truck, package_hash_map, address_to_index, distance_matrix,
+                          urgency_margin=URGENCY_MARGIN_SECONDS, reject_late=False, repair_max_moves=None,
+                          repair_time_limit=None):
+    stop_indices, stop_packages = resolve_stops(truck.initial_packages, package_hash_map, address_to_index)
+    stop_deadlines = stop_deadline_seconds(stop_packages)
+    start_index = address_to_index[truck.current_location]
+    start_seconds = truck.departure_time.total_seconds()
+    seconds_per_mile = 3600 / truck.avg_speed
+
+    distance = as_distance_array(distance_matrix)
+    order = deadline_order(start_index, start_seconds, seconds_per_mile, stop_indices, stop_deadlines, distance,
+                           urgency_margin)
+    order, moves = repair_order(order, start_index, start_seconds, seconds_per_mile, stop_indices, stop_deadlines,
+                                distance, repair_max_moves, repair_time_limit)
+
+    if reject_late:
+        arrivals, _ = projected_arrivals(start_index, start_seconds, seconds_per_mile, stop_indices, order, distance)
+        late = [package.package_id for position, arrival in zip(order, arrivals)
+                if arrival > stop_deadlines[position] for package in stop_packages[position]]
+        if late:
+            raise ValueError(f"{truck.truck_name} cannot deliver packages {late} by their deadlines")
+
+    total_mileage, last_delivery_time = apply_route(truck, order, stop_packages, start_index, stop_indices, distance)
+    return total_mileage, last_delivery_time, lateness_report(truck, package_hash_map, moves)
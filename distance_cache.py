@@ -0,0 +1,150 @@
+import csv
+import hashlib
+import os
+import struct
+import numpy as np
+
+# Cache file layout: a fixed 64 byte header followed by the packed triangle as little-endian float32 values.
+# Rows are stored exactly as they appear in the lower-triangular CSV (row i holds d(i, 0) ... d(i, i)), which is
+# the upper triangle in column-major order, so the CSV can be streamed straight to disk.
+CACHE_MAGIC = b"WGUDIST1"
+CACHE_HEADER = struct.Struct("<8sQqq32s")  # magic, address count, source mtime (ns), source size, source sha256
+CACHE_DTYPE = np.dtype("<f4")
+HASH_CHUNK_SIZE = 1 << 20
+
+
+# Function to compute the sha256 digest of a file without reading it into memory at once
+def file_digest(file_path):
+    digest = hashlib.sha256()
+    with open(file_path, mode='rb') as source:
+        for chunk in iter(lambda: source.read(HASH_CHUNK_SIZE), b""):
+            digest.update(chunk)
+    return digest.digest()
+
+
+# Function to read a cache file's header, returns None if the file is missing or not a distance cache
+def read_cache_header(cache_path):
+    try:
+        with open(cache_path, mode='rb') as cache:
+            raw = cache.read(CACHE_HEADER.size)
+    except OSError:
+        return None
+    if len(raw) != CACHE_HEADER.size:
+        return None
+    magic, size, mtime_ns, source_size, digest = CACHE_HEADER.unpack(raw)
+    if magic != CACHE_MAGIC:
+        return None
+    expected_bytes = CACHE_HEADER.size + size * (size + 1) // 2 * CACHE_DTYPE.itemsize
+    if os.path.getsize(cache_path) != expected_bytes:
+        return None  # A truncated or partially written cache is treated as missing
+    return size, mtime_ns, source_size, digest
+
+
+# Function to compile the lower-triangular distance CSV into a packed binary cache
+# The CSV is streamed one row at a time and written to a temporary file that replaces the cache when complete
+def build_distance_cache(distance_path, cache_path):
+    source_stat = os.stat(distance_path)
+    temp_path = cache_path + ".tmp"
+    size = 0
+    with open(distance_path, mode='r') as csvfile, open(temp_path, mode='wb') as cache:
+        cache.write(b"\0" * CACHE_HEADER.size)  # Reserve space for the header until the row count is known
+        for line_number, row in enumerate(csv.reader(csvfile), start=1):
+            if len(row) < size + 1:
+                raise ValueError(f"{distance_path}:{line_number}: expected {size + 1} distances, found {len(row)}")
+            # Convert the row in one call, treating empty cells as 0.0 like create_distance_matrix does
+            values = np.array([cell if cell else "0" for cell in row[:size + 1]], dtype=np.float64)
+            values.astype(CACHE_DTYPE).tofile(cache)
+            size += 1
+        cache.seek(0)
+        cache.write(CACHE_HEADER.pack(CACHE_MAGIC, size, source_stat.st_mtime_ns, source_stat.st_size,
+                                      file_digest(distance_path)))
+    os.replace(temp_path, cache_path)
+
+
+# Function to load the distance matrix through the binary cache, rebuilding the cache only when needed
+# The cache is reused while the CSV's mtime and size are unchanged. If they changed but the contents hash the same,
+# the header is refreshed instead of rebuilding the cache.
+def load_distance_matrix(distance_path, cache_path=None):
+    if cache_path is None:
+        cache_path = distance_path + ".cache"
+    source_stat = os.stat(distance_path)
+    header = read_cache_header(cache_path)
+
+    if header is None:
+        build_distance_cache(distance_path, cache_path)
+    else:
+        size, mtime_ns, source_size, digest = header
+        if (mtime_ns, source_size) != (source_stat.st_mtime_ns, source_stat.st_size):
+            if source_size == source_stat.st_size and digest == file_digest(distance_path):
+                with open(cache_path, mode='r+b') as cache:
+                    cache.write(CACHE_HEADER.pack(CACHE_MAGIC, size, source_stat.st_mtime_ns, source_stat.st_size,
+                                                  digest))
+            else:
+                build_distance_cache(distance_path, cache_path)
+    return PackedDistanceMatrix(cache_path)
+
+
+# Function to prepare a distance matrix for fancy indexing
+# Packed caches and other lazily read matrices are indexed in place, anything else is converted to a dense
+# float64 array
+def as_distance_array(distance_matrix):
+    if isinstance(distance_matrix, LazyDistanceMatrix):
+        return distance_matrix
+    return np.asarray(distance_matrix, dtype=np.float64)
+
+
+class LazyDistanceMatrix:
+    # Base for distance matrices that produce rows on demand instead of holding the full square array
+    # Subclasses set size and shape and implement row() and __getitem__ with the same indexing as an ndarray
+
+    def __len__(self):
+        return self.size
+
+    def __array__(self, *args, **kwargs):
+        # Refuse implicit conversion, which would materialize the full square matrix
+        raise TypeError(f"{type(self).__name__} cannot be converted to a dense array; index it instead")
+
+
+class PackedDistanceMatrix(LazyDistanceMatrix):
+    def __init__(self, cache_path):
+        # Memory maps a packed triangle cache so distances are read straight from the file
+        header = read_cache_header(cache_path)
+        if header is None:
+            raise ValueError(f"{cache_path} is not a valid distance cache")
+        self.cache_path = cache_path
+        self.size = header[0]
+        self.shape = (self.size, self.size)
+        self.ndim = 2
+        if self.size:
+            self.packed = np.memmap(cache_path, dtype=CACHE_DTYPE, mode='r', offset=CACHE_HEADER.size,
+                                    shape=(self.size * (self.size + 1) // 2,))
+        else:
+            self.packed = np.empty(0, dtype=CACHE_DTYPE)
+
+    def packed_index(self, i, j):
+        # Position of d(i, j) in the packed triangle, for scalar or array indices
+        i = np.asarray(i, dtype=np.int64)
+        j = np.asarray(j, dtype=np.int64)
+        high = np.maximum(i, j)
+        low = np.minimum(i, j)
+        return high * (high + 1) // 2 + low
+
+    def row(self, i):
+        # Returns every distance from address i as a float64 array
+        i = int(i)
+        values = np.empty(self.size, dtype=np.float64)
+        start = i * (i + 1) // 2
+        values[:i + 1] = self.packed[start:start + i + 1]  # d(i, 0) ... d(i, i) are stored contiguously
+        later = np.arange(i + 1, self.size, dtype=np.int64)
+        values[i + 1:] = self.packed[later * (later + 1) // 2 + i]
+        return values
+
+    def __getitem__(self, key):
+        # Supports matrix[i][j], matrix[i, j] and NumPy style fancy indexing such as matrix[np.ix_(rows, cols)]
+        if isinstance(key, tuple):
+            rows, cols = key
+            values = self.packed[self.packed_index(rows, cols)].astype(np.float64)
+            return float(values) if values.ndim == 0 else values
+        if np.ndim(key) == 0:
+            return self.row(key)
+        return np.stack([self.row(i) for i in np.asarray(key).ravel()]) if len(key) else np.empty((0, self.size))
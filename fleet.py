@@ -0,0 +1,92 @@
+import os
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+import numpy as np
+from distance_cache import LazyDistanceMatrix, PackedDistanceMatrix
+from local_search import two_opt_or_opt
+from routing import resolve_stops, nearest_order, apply_route
+
+# Distance matrix view attached by each worker process, so it is shared rather than pickled per task
+worker_matrix = None
+worker_block = None
+
+
+# Function run once in every worker process to attach to the shared distance matrix
+def attach_shared_matrix(block_name, shape, dtype):
+    global worker_matrix, worker_block
+    worker_block = shared_memory.SharedMemory(name=block_name)
+    worker_matrix = np.ndarray(shape, dtype=dtype, buffer=worker_block.buf)
+
+
+# Function run once in every worker process to memory map a packed distance cache
+# The operating system shares the mapped pages between processes, so no shared memory copy is needed
+def attach_distance_cache(cache_path):
+    global worker_matrix
+    worker_matrix = PackedDistanceMatrix(cache_path)
+
+
+# Function to compute the stop order for one truck
+# Returns positions into stop_indices in the order the stops should be visited
+def order_stops(start_index, stop_indices, distance_matrix, improve=False, max_iterations=10000, time_limit=None):
+    order = nearest_order(start_index, stop_indices, distance_matrix)
+    if improve and len(order) > 2:
+        path = np.concatenate(([start_index], stop_indices[order]))
+        refined, _ = two_opt_or_opt(path, distance_matrix, max_iterations, time_limit)
+        order = order[refined[1:] - 1]  # Drop the start location and map back onto stop positions
+    return order
+
+
+# Function executed by the worker processes against the shared distance matrix
+def order_stops_worker(task):
+    start_index, stop_indices, improve, max_iterations, time_limit = task
+    return order_stops(start_index, stop_indices, worker_matrix, improve, max_iterations, time_limit)
+
+
+# This function routes a whole fleet of trucks concurrently across a process pool
+# Each truck's packages are resolved into stops in this process, the stop ordering runs in the workers, and the
+# results are applied back onto the trucks and packages in the order the trucks were given. The distance matrix
+# is copied into shared memory once and every worker reads it from there. Returns a list of
+# (total mileage, last delivery time) tuples, one per truck, matching what nearest_algo returns.
+def route_fleet(trucks, package_hash_map, address_to_index, distance_matrix, max_workers=None, improve=False,
+                max_iterations=10000, time_limit=None):
+    if not isinstance(distance_matrix, LazyDistanceMatrix):
+        distance_matrix = np.ascontiguousarray(distance_matrix)
+    tasks = []
+    stops = []
+    for truck in trucks:
+        stop_indices, stop_packages = resolve_stops(truck.initial_packages, package_hash_map, address_to_index)
+        start_index = address_to_index[truck.current_location]
+        tasks.append((start_index, stop_indices, improve, max_iterations, time_limit))
+        stops.append((start_index, stop_indices, stop_packages))
+
+    if max_workers is None:
+        max_workers = os.cpu_count() or 1
+    max_workers = min(max_workers, len(trucks))
+
+    if max_workers <= 1 or (isinstance(distance_matrix, LazyDistanceMatrix)
+                            and not isinstance(distance_matrix, PackedDistanceMatrix)):
+        # Not worth starting a pool, or the matrix computes its rows in this process and cannot be shared,
+        # so route in this process
+        orders = [order_stops(task[0], task[1], distance_matrix, *task[2:]) for task in tasks]
+    elif isinstance(distance_matrix, PackedDistanceMatrix):
+        with ProcessPoolExecutor(max_workers=max_workers, initializer=attach_distance_cache,
+                                 initargs=(distance_matrix.cache_path,)) as pool:
+            orders = list(pool.map(order_stops_worker, tasks))
+    else:
+        block = shared_memory.SharedMemory(create=True, size=max(distance_matrix.nbytes, 1))
+        try:
+            shared = np.ndarray(distance_matrix.shape, dtype=distance_matrix.dtype, buffer=block.buf)
+            shared[...] = distance_matrix
+            with ProcessPoolExecutor(max_workers=max_workers, initializer=attach_shared_matrix,
+                                     initargs=(block.name, distance_matrix.shape, distance_matrix.dtype.str)) as pool:
+                # map() yields results in submission order, which keeps the merge deterministic
+                orders = list(pool.map(order_stops_worker, tasks))
+            del shared
+        finally:
+            block.close()
+            block.unlink()
+
+    results = []
+    for truck, order, (start_index, stop_indices, stop_packages) in zip(trucks, orders, stops):
+        results.append(apply_route(truck, order, stop_packages, start_index, stop_indices, distance_matrix))
+    return results
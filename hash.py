@@ -5,63 +5,147 @@
 # The sources above were consulted to understand hash table Data Structures.
 # However, the implementation was developed independently to meet the
 # specified requirements and optimize performance for the given use case.
+#
+# The table uses open addressing with a compact layout: a small array of slot indices points into dense,
+# insertion ordered arrays of hashes, keys and values. Any hashable key works (integer package IDs, sparse
+# barcodes or strings), and iteration follows insertion order.
+
+from array import array
+
+EMPTY = -1  # Slot has never been used
+DELETED = -2  # Slot held an entry that was removed, probing must continue past it
+PERTURB_SHIFT = 5
+DELETED_ENTRY = object()  # Placeholder stored in the dense key array for removed entries
+
 
 class HashMap:
     def __init__(self, initial_capacity=40):
-        # Create a list of 'None' buckets to values to serve as the initial buckets
-        self.buckets = [None] * initial_capacity
+        # Round the capacity up to a power of two so the bucket index can be taken with a bit mask
+        capacity = 8
+        while capacity < initial_capacity:
+            capacity *= 2
+        # Slot table, each slot holds EMPTY, DELETED or the position of an entry in the dense arrays
+        self.slots = array('q', [EMPTY]) * capacity
+        # Dense entry arrays in insertion order, removed entries are left as holes until the next resize
+        self.entry_hashes = array('q')
+        self.entry_keys = []
+        self.entry_values = []
         # Initialize the size of the hash table to 0
-        # The size will help keep track of the number of elements in the table
+        # The size will help keep track of the number of live elements in the table
         self.size = 0
-        # Define the load factor as .75 - so the hash table will resize when 75% full
+        # Define the load factor as .75 - so the hash table will resize when 75% of the slots have been used
         self.load = 0.75
 
     def custom_hash(self, key):
-        # Since package IDs are sequential and start from 1
-        # I directly mapped the package IDs to bucket indices by adjusting for 0-based indexing
-        return (key - 1) % len(self.buckets)
+        # Python's built-in hash handles integers and strings; probing mixes in the high bits so sparse or
+        # sequential IDs both spread across the table
+        return hash(key)
+
+    def find_slot(self, key, key_hash):
+        # Probes for the key and returns (slot, entry position); the entry position is -1 when the key is missing
+        # and the slot is then where the key should be inserted
+        mask = len(self.slots) - 1
+        perturb = key_hash & 0x7FFFFFFFFFFFFFFF
+        slot = key_hash & mask
+        free_slot = -1
+        while True:
+            entry = self.slots[slot]
+            if entry == EMPTY:
+                return (slot if free_slot < 0 else free_slot), -1
+            if entry == DELETED:
+                if free_slot < 0:
+                    free_slot = slot  # Reuse the first deleted slot if the key turns out to be missing
+            elif self.entry_hashes[entry] == key_hash:
+                stored_key = self.entry_keys[entry]
+                if stored_key is key or stored_key == key:
+                    return slot, entry
+            # Same probe sequence as CPython's dict, every slot is eventually visited
+            perturb >>= PERTURB_SHIFT
+            slot = (5 * slot + perturb + 1) & mask
 
     def insert(self, key, value):
         # This method checks if we need to resize before inserting and
         # doubles the size of the hashtable if the load factor becomes greater than 75%
-        if self.size / len(self.buckets) >= self.load:
-            self.resize(2 * len(self.buckets))
+        # Entries left behind by removals count towards the load, so a table full of them is compacted in place
+        if len(self.entry_keys) + 1 > self.load * len(self.slots):
+            if self.size + 1 > self.load * len(self.slots) / 2:
+                self.resize(2 * len(self.slots))
+            else:
+                self.resize(len(self.slots))
 
-        # Directly insert or update a value based on the package ID
-        bucket_index = self.custom_hash(key)
+        key_hash = self.custom_hash(key)
+        slot, entry = self.find_slot(key, key_hash)
+        if entry >= 0:
+            self.entry_values[entry] = value  # Update the value of an existing key
+            return True
+        # Append a new entry and point the slot at it
+        self.slots[slot] = len(self.entry_keys)
+        self.entry_hashes.append(key_hash)
+        self.entry_keys.append(key)
+        self.entry_values.append(value)
         # Increase self.size by 1 to keep track of the total number of elements stored in the hash table
-        if self.buckets[bucket_index] is None:
-            self.size += 1
-        self.buckets[bucket_index] = value
+        self.size += 1
         return True
 
     def lookup(self, key):
-        # This method retrieves a value using the package ID, leveraging direct indexing
-        bucket_index = self.custom_hash(key)  # Computes the bucket index for the given key using the hash function
-        # Directly return the value from the bucket
-        return self.buckets[bucket_index]
+        # This method retrieves a value by its key, returns None if the key is not in the table
+        slot, entry = self.find_slot(key, self.custom_hash(key))
+        if entry < 0:
+            return None
+        return self.entry_values[entry]
 
     def hash_remove(self, key):
         # This method removes an item from the hash table using its key
-        bucket_index = self.custom_hash(key)
-        # Checks if the bucket at the calculated index is not empty
-        if self.buckets[bucket_index] is not None:
-            self.buckets[bucket_index] = None  # If an item exits set its bucket to None, effectively removing it
-            self.size -= 1  # Decrease the size by 1 since an item is removed
-            return True
-        else:
+        slot, entry = self.find_slot(key, self.custom_hash(key))
+        if entry < 0:
             return False
+        self.slots[slot] = DELETED  # Leave a marker so later probes keep walking past this slot
+        self.entry_keys[entry] = DELETED_ENTRY
+        self.entry_values[entry] = None
+        self.size -= 1  # Decrease the size by 1 since an item is removed
+        return True
 
     def resize(self, new_capacity):
-        # This method resizes the hash table to a new capacity
-        old_buckets = self.buckets  # Store the current buckets array
-        self.buckets = [None] * new_capacity  # Create a new buckets array with the new capacity
-        old_size = self.size  # Temporarily hold the old size to restore it after re-insertion
-        self.size = 0  # Reset the size to correctly count during re-insertion
-
-        for i in range(len(old_buckets)):
-            if old_buckets[i] is not None:
-                # Re-insert each item from the old array into the new array
-                self.insert(i+1, old_buckets[i])
-        self.size = old_size
+        # This method rebuilds the hash table with a new capacity, dropping removed entries
+        capacity = 8
+        while capacity < new_capacity:
+            capacity *= 2
+        if self.size != len(self.entry_keys):
+            # Squeeze out removed entries so the dense arrays only hold live ones
+            live = [position for position, key in enumerate(self.entry_keys) if key is not DELETED_ENTRY]
+            self.entry_hashes = array('q', [self.entry_hashes[position] for position in live])
+            self.entry_keys = [self.entry_keys[position] for position in live]
+            self.entry_values = [self.entry_values[position] for position in live]
+
+        slots = array('q', [EMPTY]) * capacity
+        mask = capacity - 1
+        # Re-insert each entry with its original key; keys are unique so only the slot table is rebuilt
+        for position, key_hash in enumerate(self.entry_hashes):
+            perturb = key_hash & 0x7FFFFFFFFFFFFFFF
+            slot = key_hash & mask
+            while slots[slot] != EMPTY:
+                perturb >>= PERTURB_SHIFT
+                slot = (5 * slot + perturb + 1) & mask
+            slots[slot] = position
+        self.slots = slots
+
+    def __len__(self):
+        return self.size
+
+    def __contains__(self, key):
+        return self.find_slot(key, self.custom_hash(key))[1] >= 0
+
+    def __iter__(self):
+        # Iterates over the keys in insertion order
+        return (key for key in self.entry_keys if key is not DELETED_ENTRY)
+
+    def keys(self):
+        return iter(self)
+
+    def values(self):
+        # Iterates over the values in insertion order
+        return (value for key, value in zip(self.entry_keys, self.entry_values) if key is not DELETED_ENTRY)
 
+    def items(self):
+        # Iterates over (key, value) pairs in insertion order
+        return ((key, value) for key, value in zip(self.entry_keys, self.entry_values) if key is not DELETED_ENTRY)
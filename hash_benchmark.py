@@ -0,0 +1,77 @@
+# Microbenchmark comparing the custom HashMap against Python's built-in dict
+# Usage: python hash_benchmark.py [entry count]
+
+import random
+import sys
+import time
+from hash import HashMap
+
+
+# Function to time a callable and return the elapsed seconds
+def time_call(function):
+    start = time.perf_counter()
+    function()
+    return time.perf_counter() - start
+
+
+# Function to run insert, lookup, membership and remove workloads against a HashMap and a dict
+def run_benchmark(count, seed=0):
+    rng = random.Random(seed)
+    # Sparse 12-digit barcodes, like production package IDs
+    keys = rng.sample(range(10 ** 11, 10 ** 12), count)
+    missing = [key + 1 for key in keys[:count // 10]]  # Mostly absent keys for negative lookups
+    results = {}
+
+    hash_map = HashMap()
+    table = {}
+
+    def insert_hash_map():
+        for key in keys:
+            hash_map.insert(key, key)
+
+    def insert_dict():
+        for key in keys:
+            table[key] = key
+
+    def lookup_hash_map():
+        for key in keys:
+            hash_map.lookup(key)
+
+    def lookup_dict():
+        for key in keys:
+            table.get(key)
+
+    def contains_hash_map():
+        for key in missing:
+            key in hash_map
+
+    def contains_dict():
+        for key in missing:
+            key in table
+
+    def remove_hash_map():
+        for key in keys[::2]:
+            hash_map.hash_remove(key)
+
+    def remove_dict():
+        for key in keys[::2]:
+            table.pop(key, None)
+
+    for name, hash_map_call, dict_call in (("insert", insert_hash_map, insert_dict),
+                                           ("lookup", lookup_hash_map, lookup_dict),
+                                           ("contains", contains_hash_map, contains_dict),
+                                           ("remove", remove_hash_map, remove_dict)):
+        results[name] = (time_call(hash_map_call), time_call(dict_call))
+
+    # Every surviving key must still map to itself after the removals
+    assert len(hash_map) == len(table)
+    assert all(hash_map.lookup(key) == key for key in keys[1::2])
+    return results
+
+
+if __name__ == "__main__":
+    entry_count = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+    print(f"{'operation':<10} {'HashMap (s)':>12} {'dict (s)':>10} {'ratio':>7}  ({entry_count:,} entries)")
+    for operation, (hash_map_seconds, dict_seconds) in run_benchmark(entry_count).items():
+        ratio = hash_map_seconds / dict_seconds
+        print(f"{operation:<10} {hash_map_seconds:>12.3f} {dict_seconds:>10.3f} {ratio:>7.1f}x")
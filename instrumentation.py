@@ -0,0 +1,365 @@
+# Opt-in instrumentation for the load, route and query stages
+# Nothing in the hot paths checks whether instrumentation is on. enable() swaps counting and timing wrappers in
+# for the instrumented functions and disable() puts the originals back, so a run without instrumentation executes
+# exactly the uninstrumented code. Code that bound a function with "from module import name" before enable() keeps
+# the original; the planner imports its engines on first use, so it always sees the wrappers.
+#
+# Usage:
+#     with instrumented(StdoutSink(), JsonLinesSink("run.jsonl"), ProfileSink("run.prof")):
+#         DeliveryPlanner().routes()
+# or from the command line: WGUPS_INSTRUMENT=stdout,jsonl:run.jsonl,cprofile:run.prof python main.py
+
+import contextlib
+import cProfile
+import functools
+import json
+import sys
+import time
+import numpy as np
+import data_loader
+import deadline_routing
+import hash as hash_module
+import local_search
+import package
+import routing
+import timeline
+from distance_cache import LazyDistanceMatrix, as_distance_array
+
+INSTRUMENT_ENV_VAR = "WGUPS_INSTRUMENT"
+
+# The running Instrumentation, None while instrumentation is disabled
+active = None
+
+
+class StdoutSink:
+    def __init__(self, stream=None):
+        # Prints a summary table of every timer and counter when instrumentation is disabled
+        self.stream = stream
+
+    def start(self):
+        pass
+
+    def record(self, event):
+        pass
+
+    def finish(self, summary):
+        stream = self.stream if self.stream is not None else sys.stdout
+        print("\nInstrumentation summary", file=stream)
+        print(f"  {'timer':<36}{'calls':>10}{'total s':>12}{'mean ms':>12}{'max ms':>12}", file=stream)
+        for name, timer in sorted(summary["timers"].items()):
+            mean = timer["total_seconds"] / timer["calls"] if timer["calls"] else 0.0
+            print(f"  {name:<36}{timer['calls']:>10}{timer['total_seconds']:>12.4f}{mean * 1000:>12.4f}"
+                  f"{timer['max_seconds'] * 1000:>12.4f}", file=stream)
+        print(f"  {'counter':<36}{'value':>10}", file=stream)
+        for name, value in sorted(summary["counters"].items()):
+            print(f"  {name:<36}{value:>10}", file=stream)
+
+
+class JsonLinesSink:
+    def __init__(self, path):
+        # Appends one JSON object per event, such as each routed truck, followed by the summary
+        self.path = path
+        self.file = None
+
+    def start(self):
+        self.file = open(self.path, mode='a')
+
+    def record(self, event):
+        self.file.write(json.dumps(event) + "\n")
+
+    def finish(self, summary):
+        self.file.write(json.dumps(dict(summary, event="summary", time=time.time())) + "\n")
+        self.file.close()
+        self.file = None
+
+
+class ProfileSink:
+    def __init__(self, path):
+        # Runs cProfile for as long as instrumentation is enabled and dumps the stats for pstats or snakeviz
+        self.path = path
+        self.profiler = None
+
+    def start(self):
+        self.profiler = cProfile.Profile()
+        self.profiler.enable()
+
+    def record(self, event):
+        pass
+
+    def finish(self, summary):
+        self.profiler.disable()
+        self.profiler.dump_stats(self.path)
+        self.profiler = None
+
+
+class CountingRow:
+    def __init__(self, row, instrumentation):
+        # One matrix row handed out by CountingDistanceMatrix, so matrix[i][j] lookups are counted too
+        self.row = row
+        self.instrumentation = instrumentation
+
+    def __len__(self):
+        return len(self.row)
+
+    def __array__(self, *args, **kwargs):
+        return np.asarray(self.row, *args, **kwargs)
+
+    def __getitem__(self, key):
+        values = self.row[key]
+        self.instrumentation.count("distance_lookups", int(np.size(values)))
+        return values
+
+
+class CountingDistanceMatrix(LazyDistanceMatrix):
+    def __init__(self, distance_matrix, instrumentation):
+        # Forwards every lookup to the wrapped matrix and counts the distances read
+        # Passing as a lazily read matrix makes the vectorized engines index it in place instead of converting it
+        self.base = as_distance_array(distance_matrix)
+        self.instrumentation = instrumentation
+        self.size = len(self.base)
+        self.shape = (self.size, self.size)
+        self.ndim = 2
+
+    def row(self, i):
+        self.instrumentation.count("distance_lookups", self.size)
+        return self.base.row(i) if isinstance(self.base, LazyDistanceMatrix) else self.base[i]
+
+    def __getitem__(self, key):
+        if not isinstance(key, tuple) and np.ndim(key) == 0:
+            # A single row, its entries are counted as they are read
+            return CountingRow(self.base[key], self.instrumentation)
+        values = self.base[key]
+        self.instrumentation.count("distance_lookups", int(np.size(values)))
+        return values
+
+
+# Function to count the slots find_slot visited before it returned
+# Replays the table's probe sequence from the key's hash, which is cheaper than instrumenting the probe loop itself.
+# A hit stops at the slot holding the found entry. A miss probes past tombstones until it reaches an empty slot,
+# and its entry is -1, the same value as the EMPTY marker, so both cases stop at the first slot holding entry.
+def count_probes(table, key_hash, entry, perturb_shift):
+    mask = len(table.slots) - 1
+    perturb = key_hash & 0x7FFFFFFFFFFFFFFF
+    slot = key_hash & mask
+    probes = 1
+    while table.slots[slot] != entry and probes <= len(table.slots):
+        perturb >>= perturb_shift
+        slot = (5 * slot + perturb + 1) & mask
+        probes += 1
+    return probes
+
+
+class Instrumentation:
+    def __init__(self, sinks):
+        # Counters and timers collected while enabled, plus the functions swapped out so they can be restored
+        self.sinks = list(sinks)
+        self.counters = {}
+        self.timers = {}  # Maps a timer name to [calls, total seconds, max seconds]
+        self.patches = []
+        self.stop_count = None  # Stops resolved by the engine currently routing a truck
+
+    def count(self, name, amount=1):
+        self.counters[name] = self.counters.get(name, 0) + amount
+
+    def add_time(self, name, seconds):
+        timer = self.timers.get(name)
+        if timer is None:
+            self.timers[name] = [1, seconds, seconds]
+        else:
+            timer[0] += 1
+            timer[1] += seconds
+            timer[2] = max(timer[2], seconds)
+
+    def emit(self, event):
+        event["time"] = time.time()
+        for sink in self.sinks:
+            sink.record(event)
+
+    def summary(self):
+        return {
+            "counters": dict(self.counters),
+            "timers": {name: {"calls": calls, "total_seconds": total, "max_seconds": longest}
+                       for name, (calls, total, longest) in self.timers.items()},
+        }
+
+    def patch(self, owner, name, wrap):
+        # Replaces owner.name with wrap(original) until restore() is called
+        original = getattr(owner, name)
+        self.patches.append((owner, name, original))
+        setattr(owner, name, wrap(original))
+
+    def restore(self):
+        for owner, name, original in reversed(self.patches):
+            setattr(owner, name, original)
+        self.patches = []
+
+    def timed(self, name):
+        # Wrapper factory that times every call under the given timer name
+        def wrap(function):
+            @functools.wraps(function)
+            def wrapper(*args, **kwargs):
+                start = time.perf_counter()
+                try:
+                    return function(*args, **kwargs)
+                finally:
+                    self.add_time(name, time.perf_counter() - start)
+            return wrapper
+        return wrap
+
+    def routed(self, engine):
+        # Wrapper factory for routing engines: counts the distance lookups the engine makes, times it and emits
+        # one event per truck. Iterations are selection steps, one per stop, or one per package for nearest_algo.
+        def wrap(function):
+            @functools.wraps(function)
+            def wrapper(truck, package_hash_map, address_to_index, distance_matrix, *args, **kwargs):
+                lookups_before = self.counters.get("distance_lookups", 0)
+                self.stop_count = None
+                start = time.perf_counter()
+                result = function(truck, package_hash_map, address_to_index,
+                                  CountingDistanceMatrix(distance_matrix, self), *args, **kwargs)
+                seconds = time.perf_counter() - start
+                iterations = len(truck.initial_packages) if self.stop_count is None else self.stop_count
+                self.add_time(f"route.{engine}", seconds)
+                self.count("routing_iterations", iterations)
+                self.emit({"event": "route", "engine": engine, "truck": truck.truck_name,
+                           "packages": len(truck.initial_packages), "iterations": iterations,
+                           "distance_lookups": self.counters.get("distance_lookups", 0) - lookups_before,
+                           "mileage": float(truck.total_mileage), "seconds": seconds})
+                return result
+            return wrapper
+        return wrap
+
+    def install(self):
+        # Swaps the wrappers in for every instrumented function
+        # Load stage
+        def count_rows(function):
+            timed = self.timed("data_loader.read_csv_data")(function)
+
+            @functools.wraps(function)
+            def wrapper(file_path):
+                rows = timed(file_path)
+                self.count("csv_rows", len(rows))
+                return rows
+            return wrapper
+        self.patch(data_loader, "read_csv_data", count_rows)
+
+        def count_distance(function):
+            @functools.wraps(function)
+            def wrapper(*args, **kwargs):
+                self.count("distance_lookups")
+                return function(*args, **kwargs)
+            return wrapper
+        self.patch(data_loader, "get_distance", count_distance)
+
+        # Hash table
+        def count_probes_wrapper(function):
+            @functools.wraps(function)
+            def wrapper(table, key, key_hash):
+                result = function(table, key, key_hash)
+                self.count("hash_lookups")
+                self.count("hash_probes", count_probes(table, key_hash, result[1], hash_module.PERTURB_SHIFT))
+                return result
+            return wrapper
+        self.patch(hash_module.HashMap, "find_slot", count_probes_wrapper)
+
+        def count_resizes(function):
+            timed = self.timed("hash.resize")(function)
+
+            @functools.wraps(function)
+            def wrapper(table, new_capacity):
+                self.count("hash_resizes")
+                return timed(table, new_capacity)
+            return wrapper
+        self.patch(hash_module.HashMap, "resize", count_resizes)
+
+        # Route stage
+        def record_stops(function):
+            @functools.wraps(function)
+            def wrapper(*args, **kwargs):
+                stop_indices, stop_packages = function(*args, **kwargs)
+                self.stop_count = len(stop_indices)
+                return stop_indices, stop_packages
+            return wrapper
+        self.patch(routing, "resolve_stops", record_stops)
+        self.patch(deadline_routing, "resolve_stops", record_stops)
+        self.patch(routing, "nearest_algo", self.routed("nearest_algo"))
+        self.patch(routing, "vectorized_nearest_algo", self.routed("vectorized_nearest_algo"))
+        self.patch(deadline_routing, "deadline_nearest_algo", self.routed("deadline_nearest_algo"))
+
+        def count_improvement(function):
+            # Local search reads distances too, so they are counted like the routing engines' lookups
+            timed = self.timed("local_search.improve_route")(function)
+
+            @functools.wraps(function)
+            def wrapper(truck, package_hash_map, address_to_index, distance_matrix, *args, **kwargs):
+                return timed(truck, package_hash_map, address_to_index, CountingDistanceMatrix(distance_matrix, self),
+                             *args, **kwargs)
+            return wrapper
+        self.patch(local_search, "improve_route", count_improvement)
+
+        def count_iterations(function):
+            @functools.wraps(function)
+            def wrapper(*args, **kwargs):
+                order, iterations = function(*args, **kwargs)
+                self.count("local_search_iterations", iterations)
+                return order, iterations
+            return wrapper
+        self.patch(local_search, "two_opt_or_opt", count_iterations)
+
+        # Query stage
+        self.patch(package.Package, "get_status_str", self.timed("package.get_status_str"))
+        self.patch(timeline.StatusTimeline, "status_line", self.timed("timeline.status_line"))
+        self.patch(timeline.StatusTimeline, "status_counts", self.timed("timeline.status_counts"))
+
+
+# Function to turn on instrumentation, reporting to the given sinks (a stdout summary by default)
+def enable(*sinks):
+    global active
+    if active is not None:
+        raise RuntimeError("Instrumentation is already enabled")
+    instrumentation = Instrumentation(sinks or (StdoutSink(),))
+    instrumentation.install()
+    for sink in instrumentation.sinks:
+        sink.start()
+    active = instrumentation
+    return instrumentation
+
+
+# Function to turn off instrumentation, restoring the original functions and flushing every sink
+# Returns the summary of the counters and timers collected
+def disable():
+    global active
+    instrumentation, active = active, None
+    if instrumentation is None:
+        return None
+    instrumentation.restore()
+    summary = instrumentation.summary()
+    for sink in instrumentation.sinks:
+        sink.finish(summary)
+    return summary
+
+
+# Context manager that keeps instrumentation enabled for the duration of a block
+@contextlib.contextmanager
+def instrumented(*sinks):
+    instrumentation = enable(*sinks)
+    try:
+        yield instrumentation
+    finally:
+        disable()
+
+
+# Function to build sinks from a comma separated spec such as "stdout,jsonl:run.jsonl,cprofile:run.prof"
+def sinks_from_spec(spec):
+    sinks = []
+    for item in spec.split(","):
+        kind, _, path = item.strip().partition(":")
+        if kind == "stdout":
+            sinks.append(StdoutSink())
+        elif kind == "jsonl" and path:
+            sinks.append(JsonLinesSink(path))
+        elif kind == "cprofile" and path:
+            sinks.append(ProfileSink(path))
+        else:
+            raise ValueError(f"Unknown instrumentation sink {item!r}, expected stdout, jsonl:PATH or cprofile:PATH")
+    return sinks
@@ -0,0 +1,156 @@
+import time
+import numpy as np
+from distance_cache import as_distance_array
+from routing import resolve_stops, apply_route
+
+# Moves must shorten the route by more than this many miles to be applied, which avoids cycling on float noise
+IMPROVEMENT_EPSILON = 1e-9
+# Longest run of consecutive stops that an Or-opt move relocates
+OR_OPT_MAX_SEGMENT = 3
+
+
+# Function to total the miles driven along a path of matrix indices, starting at the first entry
+def path_mileage(path, distance_matrix):
+    total = 0.0
+    for k in range(1, len(path)):
+        total += distance_matrix[path[k - 1], path[k]]
+    return float(total)
+
+
+# Function to find the best 2-opt move that starts at position i of the path
+# Reversing path[i..j] replaces the edges (a, b) and (c, d) with (a, c) and (b, d). Routes are open paths
+# that end at the last stop, so when j is the final position there is no edge (c, d) to replace.
+def best_two_opt(path, i, distance):
+    a, b = path[i - 1], path[i]
+    c = path[i + 1:]
+    if len(c) == 0:
+        return 0.0, i
+    d = path[i + 2:]
+    removed_tail = np.append(distance[c[:-1], d], 0.0)
+    added_tail = np.append(distance[b, d], 0.0)
+    delta = distance[a, c] + added_tail - distance[a, b] - removed_tail
+    best = int(np.argmin(delta))
+    return float(delta[best]), i + 1 + best
+
+
+# Function to find the best Or-opt move for the segment path[i..i+length-1]
+# The segment is taken out of the path and reinserted, in either direction, after another stop
+def best_or_opt(path, i, length, distance):
+    end = i + length - 1
+    first, last = path[i], path[end]
+    prev = path[i - 1]
+    has_next = end + 1 < len(path)
+
+    # Miles saved by taking the segment out of the path
+    removal_gain = distance[prev, first]
+    if has_next:
+        nxt = path[end + 1]
+        removal_gain += distance[last, nxt] - distance[prev, nxt]
+
+    rest = np.concatenate((path[:i], path[end + 1:]))
+    u = rest
+    v = rest[1:]
+    # Miles added by inserting the segment between u and v, in forward and reversed orientation
+    bridge = np.append(distance[u[:-1], v], 0.0)
+    forward = distance[u, first] + np.append(distance[last, v], 0.0) - bridge
+    backward = distance[u, last] + np.append(distance[first, v], 0.0) - bridge
+    # Reinserting the segment where it came from is not a move
+    forward[i - 1] = np.inf
+    backward[i - 1] = np.inf
+
+    best_forward = int(np.argmin(forward))
+    best_backward = int(np.argmin(backward))
+    if forward[best_forward] <= backward[best_backward]:
+        return float(forward[best_forward] - removal_gain), best_forward, False
+    return float(backward[best_backward] - removal_gain), best_backward, True
+
+
+# Function to improve a path of matrix indices with 2-opt and Or-opt moves
+# The first entry of the path is the truck's start location and never moves. Position arrays are returned so
+# callers can map the result back onto their stops. The search stops at a local optimum or when either the
+# iteration budget (applied moves) or the time budget (seconds) runs out.
+def two_opt_or_opt(path, distance_matrix, max_iterations=10000, time_limit=None):
+    distance = as_distance_array(distance_matrix)
+    order = np.arange(len(path))  # Position of each path entry in the input path
+    path = np.array(path, dtype=np.intp)  # Work on a copy so the caller's path is left untouched
+    deadline = None if time_limit is None else time.perf_counter() + time_limit
+    iterations = 0
+
+    def out_of_budget():
+        if iterations >= max_iterations:
+            return True
+        return deadline is not None and time.perf_counter() >= deadline
+
+    improved = True
+    while improved and not out_of_budget():
+        improved = False
+
+        # 2-opt pass: reverse any segment whose reversal shortens the route
+        for i in range(1, len(path) - 1):
+            if out_of_budget():
+                break
+            delta, j = best_two_opt(path, i, distance)
+            if delta < -IMPROVEMENT_EPSILON:
+                path[i:j + 1] = path[i:j + 1][::-1].copy()
+                order[i:j + 1] = order[i:j + 1][::-1].copy()
+                iterations += 1
+                improved = True
+
+        # Or-opt pass: relocate short runs of stops to a cheaper spot in the route
+        for length in range(1, OR_OPT_MAX_SEGMENT + 1):
+            i = 1
+            while i + length <= len(path) and len(path) - length > 1:
+                if out_of_budget():
+                    break
+                delta, k, reverse = best_or_opt(path, i, length, distance)
+                if delta < -IMPROVEMENT_EPSILON:
+                    path = relocate(path, i, length, k, reverse)
+                    order = relocate(order, i, length, k, reverse)
+                    iterations += 1
+                    improved = True
+                i += 1
+
+    return order, iterations
+
+
+# Function to move path[i..i+length-1] so it follows entry k of the path with the segment removed
+def relocate(path, i, length, k, reverse):
+    segment = path[i:i + length]
+    if reverse:
+        segment = segment[::-1]
+    rest = np.concatenate((path[:i], path[i + length:]))
+    return np.concatenate((rest[:k + 1], segment, rest[k + 1:]))
+
+
+# This function is an optional post-optimization stage for a truck that has already been routed
+# It reorders the truck's stops with 2-opt and Or-opt moves, then re-drives the new route so the truck's mileage
+# and every package's delivery time reflect it. Returns the route mileage before and after the improvement.
+# A truck that has not been routed yet is driven in its loading order first, so it starts from zero miles and
+# every package gets a delivery time even when no move improves the route.
+def improve_route(truck, package_hash_map, address_to_index, distance_matrix, max_iterations=10000,
+                  time_limit=None):
+    routed = bool(truck.route)
+    visit_order = truck.route if routed else truck.initial_packages
+    stop_indices, stop_packages = resolve_stops(visit_order, package_hash_map, address_to_index)
+    start_index = address_to_index[truck.current_location]
+
+    path = np.concatenate(([start_index], stop_indices)).astype(np.intp)
+    mileage_before = path_mileage(path, distance_matrix)
+    order, _ = two_opt_or_opt(path, distance_matrix, max_iterations, time_limit)
+    mileage_after = path_mileage(path[order], distance_matrix)
+
+    if mileage_after < mileage_before or not routed:
+        # Remove the old route's miles and re-drive the improved route to recompute delivery times
+        if routed:
+            truck.total_mileage -= mileage_before
+        else:
+            truck.total_mileage = 0
+        if mileage_after >= mileage_before:
+            order = np.arange(len(path))  # Nothing improved, keep the loading order
+            mileage_after = mileage_before
+        route = order[1:] - 1  # Drop the start location and convert to stop positions
+        apply_route(truck, route, stop_packages, start_index, stop_indices, distance_matrix)
+    else:
+        mileage_after = mileage_before
+
+    return mileage_before, mileage_after
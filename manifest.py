@@ -0,0 +1,141 @@
+import csv
+import numpy as np
+from assignment import parse_special_notes
+from package import parse_deadline
+from package_store import PackageStore, parse_weight
+
+# Number of rows parsed before they are written into the store as one batch
+DEFAULT_CHUNK_SIZE = 10000
+# Package IDs are stored in an int64 column
+MAX_PACKAGE_ID = np.iinfo(np.int64).max
+MIN_PACKAGE_ID = np.iinfo(np.int64).min
+# Bad rows beyond this many are counted but their details are not kept, so memory stays bounded
+MAX_REPORTED_ERRORS = 1000
+
+
+class ManifestRowError:
+    def __init__(self, line_number, message, row):
+        # Describes a manifest row that was rejected during loading
+        self.line_number = line_number
+        self.message = message
+        self.row = row
+
+    def __str__(self):
+        return f"line {self.line_number}: {self.message}"
+
+
+class ManifestLoadReport:
+    def __init__(self):
+        # Summary of a streaming load
+        self.loaded = 0
+        self.rejected = 0
+        self.errors = []  # The first MAX_REPORTED_ERRORS rejected rows
+
+    def reject(self, error):
+        self.rejected += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append(error)
+
+
+class ManifestChunk:
+    def __init__(self):
+        # Parsed columns for one chunk of manifest rows
+        self.package_ids = []
+        self.address_fields = []
+        self.deadlines = []
+        self.weights = []
+        self.special_notes = []
+        self.line_numbers = []
+        self.errors = []
+
+    def __len__(self):
+        return len(self.package_ids)
+
+
+# Function to parse and validate one manifest row, raises ValueError describing the first problem found
+def parse_manifest_row(row, address_to_index):
+    if len(row) < 7:
+        raise ValueError(f"expected at least 7 columns, found {len(row)}")
+    try:
+        package_id = int(row[0])
+    except ValueError:
+        raise ValueError(f"invalid package ID {row[0]!r}") from None
+    if not MIN_PACKAGE_ID <= package_id <= MAX_PACKAGE_ID:
+        raise ValueError(f"package ID {package_id} does not fit in 64 bits")
+    address_fields = tuple(cell.strip() for cell in row[1:5])
+    if address_fields[0] not in address_to_index:
+        raise ValueError(f"unknown delivery address {address_fields[0]!r}")
+    deadline = parse_deadline(row[5])
+    weight = parse_weight(row[6].strip())
+    if not (np.isfinite(weight) and weight > 0):
+        raise ValueError(f"package weight must be a positive number, found {row[6].strip()!r}")
+    # Rejoin the special notes since csv.reader splits notes such as 'Must be delivered with 15, 19'
+    notes = ",".join(row[7:]).strip().strip("'")
+    parse_special_notes(notes)  # Validates the notes, the store keeps the original text
+    return package_id, address_fields, np.inf if deadline is None else deadline.total_seconds(), weight, notes
+
+
+# Generator that reads the package file in bounded chunks
+# Each chunk holds at most chunk_size valid rows plus the rows that were rejected while filling it, so memory
+# use depends on the chunk size rather than the size of the file
+def iter_manifest_chunks(package_path, address_to_index, chunk_size=DEFAULT_CHUNK_SIZE):
+    with open(package_path, mode='r', newline='') as csvfile:
+        reader = csv.reader(csvfile)
+        chunk = ManifestChunk()
+        for row in reader:
+            if not row or not any(cell.strip() for cell in row):
+                continue  # Skip blank lines
+            try:
+                package_id, address_fields, deadline, weight, notes = parse_manifest_row(row, address_to_index)
+            except ValueError as error:
+                # reader.line_num is the line the row ended on, which is right for single line rows
+                chunk.errors.append(ManifestRowError(reader.line_num, str(error), row))
+                if len(chunk.errors) >= chunk_size:
+                    yield chunk  # Hand over the rejected rows so a file of bad rows cannot build up in memory
+                    chunk = ManifestChunk()
+                continue
+            chunk.package_ids.append(package_id)
+            chunk.address_fields.append(address_fields)
+            chunk.deadlines.append(deadline)
+            chunk.weights.append(weight)
+            chunk.special_notes.append(notes)
+            chunk.line_numbers.append(reader.line_num)
+            if len(chunk) >= chunk_size:
+                yield chunk
+                chunk = ManifestChunk()
+        if len(chunk) or chunk.errors:
+            yield chunk
+
+
+# Function to stream a package manifest into a package store in batches
+# Bad rows are reported with their line numbers and skipped instead of aborting the load. Package IDs already
+# in the store, or repeated within the file, are rejected as duplicates.
+def stream_manifest(package_path, address_to_index, store=None, chunk_size=DEFAULT_CHUNK_SIZE):
+    if store is None:
+        store = PackageStore(address_to_index)
+    report = ManifestLoadReport()
+    for chunk in iter_manifest_chunks(package_path, address_to_index, chunk_size):
+        for error in chunk.errors:
+            report.reject(error)
+
+        keep = []
+        seen = set()
+        for position, package_id in enumerate(chunk.package_ids):
+            if package_id in store or package_id in seen:
+                report.reject(ManifestRowError(chunk.line_numbers[position], f"duplicate package ID {package_id}",
+                                               None))
+                continue
+            seen.add(package_id)
+            keep.append(position)
+
+        if not keep:
+            continue
+        if len(keep) != len(chunk):
+            # Drop the duplicates from every column before the batch insert
+            for name in ("package_ids", "address_fields", "deadlines", "weights", "special_notes"):
+                column = getattr(chunk, name)
+                setattr(chunk, name, [column[position] for position in keep])
+        store.insert_batch(chunk.package_ids, chunk.address_fields, chunk.deadlines, chunk.weights,
+                           chunk.special_notes)
+        report.loaded += len(chunk.package_ids)
+    return store, report
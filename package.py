@@ -1,6 +1,26 @@
+import datetime
+
+
+# Function to convert a clock time such as "10:30 AM" or "9:05 am" into a timedelta since midnight
+def parse_time_of_day(time_str):
+    clock, am_pm = time_str.strip().upper().split()
+    hours, minutes = map(int, clock.split(":"))
+    if am_pm not in ("AM", "PM") or not (1 <= hours <= 12 and 0 <= minutes <= 59):
+        raise ValueError(f"Invalid time of day: {time_str!r}")
+    hours = hours % 12 + (12 if am_pm == "PM" else 0)  # Convert the 12-hour clock to a 24-hour clock
+    return datetime.timedelta(hours=hours, minutes=minutes)
+
+
+# Function to convert a delivery deadline into a timedelta, end of day ("EOD") deadlines return None
+def parse_deadline(deadline):
+    if deadline.strip().upper() == "EOD":
+        return None
+    return parse_time_of_day(deadline)
+
+
 class Package:
     def __init__(self, package_id, delivery_address, delivery_city, delivery_state, delivery_zip, delivery_deadline,
-                 package_weight, initial_status="At Hub"):
+                 package_weight, initial_status="At Hub", special_notes=""):
         # Initialize a new instance of the package class with various attributes related to the
         # package delivery details.
         self.package_id = package_id
@@ -14,6 +34,11 @@ class Package:
         self.departure_time = None
         self.delivery_time = None
         self.loaded_truck = None
+        self.special_notes = special_notes
+
+    # Method to point the package at a different (address, city, state, zip), e.g. after an address correction
+    def set_address_fields(self, address_fields):
+        self.delivery_address, self.delivery_city, self.delivery_state, self.delivery_zip = address_fields
 
     # Method to update the package's status based on the current time and prepare a status string
     def get_status_str(self, current_time=None):
@@ -29,27 +54,36 @@ class Package:
             else:
                 self.status = f"At Hub in {truck_info}"  # Otherwise, It's still at the hub
 
-        # Prepare the base of the status string including package details
-        status_str = f"Status: {self.status}"
-        if self.status == "Delivered" and self.delivery_time is not None:
-            # If the package is delivered format the time into a readable string
-            total_seconds = int(self.delivery_time.total_seconds())
-            hours = total_seconds // 3600  # Calculate hours
-            minutes = (total_seconds % 3600) // 60  # Calculate minutes
-            # Adjust hours for 12-hour format and determine AM/PM
-            hours_display = hours % 24
-            am_pm = "AM" if hours < 12 else "PM"
-            if hours_display == 0:
-                hours_display = 12
-            elif hours_display > 12:
-                hours_display -= 12
-
-            delivery_str = f"{hours_display:02d}:{minutes:02d} {am_pm}"  # Format the delivery time string
-            status_str = f", Delivered at {delivery_str} by {truck_info}"  # Append delivery time to status string
-        else:
-            delivery_str = "N/A"
+        return format_status_line(self, self.status, truck_info)
+
+
+# Function to build a package's status line for a given status without modifying the package
+# address_fields optionally overrides the (address, city, state, zip) shown, e.g. before an address correction
+def format_status_line(package, status, truck_info, address_fields=None):
+    if address_fields is None:
+        address_fields = (package.delivery_address, package.delivery_city, package.delivery_state,
+                          package.delivery_zip)
+    address, city, state, zip_code = address_fields
+
+    # Prepare the base of the status string including package details
+    status_str = f"Status: {status}"
+    if status == "Delivered" and package.delivery_time is not None:
+        # If the package is delivered format the time into a readable string
+        total_seconds = int(package.delivery_time.total_seconds())
+        hours = total_seconds // 3600  # Calculate hours
+        minutes = (total_seconds % 3600) // 60  # Calculate minutes
+        # Adjust hours for 12-hour format and determine AM/PM
+        hours_display = hours % 24
+        am_pm = "AM" if hours < 12 else "PM"
+        if hours_display == 0:
+            hours_display = 12
+        elif hours_display > 12:
+            hours_display -= 12
+
+        delivery_str = f"{hours_display:02d}:{minutes:02d} {am_pm}"  # Format the delivery time string
+        status_str = f", Delivered at {delivery_str} by {truck_info}"  # Append delivery time to status string
 
-        # Return the full status string including all package details
-        return (
-            f"Package ID: {self.package_id}, Address: {self.delivery_address}, {self.delivery_city}, {self.delivery_state},"
-            f" {self.delivery_zip}, Deadline: {self.delivery_deadline}, Weight: {self.package_weight}, {status_str}")
+    # Return the full status string including all package details
+    return (
+        f"Package ID: {package.package_id}, Address: {address}, {city}, {state},"
+        f" {zip_code}, Deadline: {package.delivery_deadline}, Weight: {package.package_weight}, {status_str}")
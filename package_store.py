@@ -0,0 +1,351 @@
+import csv
+import datetime
+import numpy as np
+from hash import HashMap
+from package import format_status_line, parse_deadline
+
+# Status codes kept in the status column
+STATUS_INITIAL = 0  # Loaded from the manifest, status never evaluated
+STATUS_AT_HUB = 1
+STATUS_EN_ROUTE = 2
+STATUS_DELIVERED = 3
+NO_TRUCK = -1
+WEIGHT_UNIT = "Kilos"
+INITIAL_CAPACITY = 64
+
+
+# Function to convert a weight such as "21 Kilos" into a float
+def parse_weight(weight):
+    parts = weight.split()
+    if len(parts) != 2 or parts[1] != WEIGHT_UNIT:
+        raise ValueError(f"Invalid package weight: {weight!r}")
+    return float(parts[0])
+
+
+# Function to format seconds since midnight as a clock time such as "10:30 AM"
+def format_time_of_day(seconds):
+    hours, minutes = int(seconds) // 3600, (int(seconds) % 3600) // 60
+    return f"{hours % 12 if hours % 12 else 12}:{minutes:02d} {'AM' if hours < 12 else 'PM'}"
+
+
+# Function to convert seconds into a timedelta, NaN (no time recorded) becomes None
+def seconds_to_timedelta(seconds):
+    return None if np.isnan(seconds) else datetime.timedelta(seconds=float(seconds))
+
+
+class PackageStore:
+    def __init__(self, address_to_index, initial_capacity=INITIAL_CAPACITY):
+        # Stores packages as one NumPy column per attribute instead of one object per package
+        self.address_to_index = address_to_index
+        self.count = 0
+        capacity = max(initial_capacity, 1)
+        self.package_ids = np.empty(capacity, dtype=np.int64)
+        self.address_indices = np.empty(capacity, dtype=np.int32)  # Distance matrix index of the address
+        self.address_refs = np.empty(capacity, dtype=np.int32)  # Row of the address in address_table
+        self.deadlines = np.empty(capacity, dtype=np.float64)  # Seconds since midnight, inf for EOD
+        self.weights = np.empty(capacity, dtype=np.float32)
+        self.truck_ids = np.empty(capacity, dtype=np.int32)  # Position in self.trucks, NO_TRUCK if unloaded
+        self.departure_times = np.empty(capacity, dtype=np.float64)  # Seconds since midnight, NaN if unknown
+        self.delivery_times = np.empty(capacity, dtype=np.float64)
+        self.statuses = np.empty(capacity, dtype=np.int8)
+        # Distinct (address, city, state, zip) tuples, shared by every package at the same address
+        self.address_table = []
+        self.address_refs_by_fields = {}
+        # Notes are rare, so they are kept sparsely by row
+        self.notes = {}
+        self.trucks = []
+        self.truck_ids_by_object = {}
+        self.rows = HashMap()  # Package ID to row
+
+    def __len__(self):
+        return self.count
+
+    def __contains__(self, package_id):
+        return package_id in self.rows
+
+    def reserve(self, capacity):
+        # Grows every column to hold at least the given number of packages
+        if capacity <= len(self.package_ids):
+            return
+        new_capacity = len(self.package_ids)
+        while new_capacity < capacity:
+            new_capacity *= 2
+        for name in ("package_ids", "address_indices", "address_refs", "deadlines", "weights", "truck_ids",
+                     "departure_times", "delivery_times", "statuses"):
+            column = getattr(self, name)
+            grown = np.empty(new_capacity, dtype=column.dtype)
+            grown[:self.count] = column[:self.count]
+            setattr(self, name, grown)
+
+    def address_ref(self, address_fields):
+        # Returns the row of the address in the shared address table, adding it if it is new
+        ref = self.address_refs_by_fields.get(address_fields)
+        if ref is None:
+            ref = len(self.address_table)
+            self.address_table.append(address_fields)
+            self.address_refs_by_fields[address_fields] = ref
+        return ref
+
+    def truck_id(self, truck):
+        # Returns the position of the truck in the truck table, adding it if it is new
+        if truck is None:
+            return NO_TRUCK
+        position = self.truck_ids_by_object.get(id(truck))
+        if position is None:
+            position = len(self.trucks)
+            self.trucks.append(truck)
+            self.truck_ids_by_object[id(truck)] = position
+        return position
+
+    def insert(self, package_id, delivery_address, delivery_city, delivery_state, delivery_zip, delivery_deadline,
+               package_weight, special_notes=""):
+        # Parses and appends one package, returns its row
+        # Like HashMap.insert, inserting an ID that is already stored replaces that package in its existing row
+        deadline = parse_deadline(delivery_deadline)
+        weight = parse_weight(package_weight)
+        address_index = self.address_to_index[delivery_address]
+        row = self.rows.lookup(package_id)
+        if row is None:
+            self.reserve(self.count + 1)
+            row = self.count
+            self.rows.insert(package_id, row)
+            self.count += 1
+        self.package_ids[row] = package_id
+        self.address_indices[row] = address_index
+        self.address_refs[row] = self.address_ref((delivery_address, delivery_city, delivery_state, delivery_zip))
+        self.deadlines[row] = np.inf if deadline is None else deadline.total_seconds()
+        self.weights[row] = weight
+        self.truck_ids[row] = NO_TRUCK
+        self.departure_times[row] = np.nan
+        self.delivery_times[row] = np.nan
+        self.statuses[row] = STATUS_INITIAL
+        if special_notes:
+            self.notes[row] = special_notes
+        else:
+            self.notes.pop(row, None)  # Drop the notes of a package this one replaced
+        return row
+
+    def insert_batch(self, package_ids, address_fields, deadlines, weights, special_notes):
+        # Appends a batch of already parsed packages with one write per column, returns the first row
+        # deadlines are seconds since midnight (inf for EOD) and weights are floats
+        # Every package ID must be new to the store and appear once in the batch
+        size = len(package_ids)
+        if len(set(package_ids)) != size:
+            raise ValueError("Package IDs repeat within the batch")
+        duplicates = [package_id for package_id in package_ids if package_id in self.rows]
+        if duplicates:
+            raise ValueError(f"Package IDs already in the store: {duplicates[:10]}")
+        start = self.count
+        self.reserve(start + size)
+        rows = slice(start, start + size)
+        self.package_ids[rows] = package_ids
+        self.address_refs[rows] = [self.address_ref(fields) for fields in address_fields]
+        self.address_indices[rows] = [self.address_to_index[fields[0]] for fields in address_fields]
+        self.deadlines[rows] = deadlines
+        self.weights[rows] = weights
+        self.truck_ids[rows] = NO_TRUCK
+        self.departure_times[rows] = np.nan
+        self.delivery_times[rows] = np.nan
+        self.statuses[rows] = STATUS_INITIAL
+        for offset, (package_id, notes) in enumerate(zip(package_ids, special_notes)):
+            if notes:
+                self.notes[start + offset] = notes
+            self.rows.insert(package_id, start + offset)
+        self.count += size
+        return start
+
+    def lookup(self, package_id):
+        # Returns a Package-compatible view of the package, or None if it is not in the store
+        row = self.rows.lookup(package_id)
+        return None if row is None else PackageView(self, row)
+
+    def values(self):
+        # Iterates over views of every package in load order
+        return (PackageView(self, row) for row in range(self.count))
+
+    def rows_for(self, package_ids):
+        # Returns the rows of the given package IDs as an array
+        return np.array([self.rows.lookup(package_id) for package_id in package_ids], dtype=np.intp)
+
+    def route_truck(self, truck, distance_matrix, route_order):
+        # Routes a truck entirely against the columns and returns (total mileage, last delivery time)
+        # route_order is a function like routing.nearest_order that orders the stops from the start location
+        rows = self.rows_for(truck.initial_packages)
+        # Group packages by address, keeping stops in the order their first package was loaded
+        stop_indices, first_rows, stop_of_row = np.unique(self.address_indices[rows], return_index=True,
+                                                          return_inverse=True)
+        load_order = np.argsort(first_rows, kind="stable")
+        stop_indices = stop_indices[load_order].astype(np.intp)
+        stop_rank = np.empty_like(load_order)
+        stop_rank[load_order] = np.arange(len(load_order))
+        stop_of_row = stop_rank[stop_of_row.ravel()]
+
+        start_index = self.address_to_index[truck.current_location]
+        order = route_order(start_index, stop_indices, distance_matrix)
+        path = np.concatenate(([start_index], stop_indices[order])).astype(np.intp)
+        legs = np.asarray(distance_matrix[path[:-1], path[1:]], dtype=np.float64)
+        arrival = truck.departure_time.total_seconds() + np.cumsum(legs) * 3600 / truck.avg_speed
+
+        # Arrival time of every stop, indexed by stop position
+        stop_arrival = np.empty(len(order), dtype=np.float64)
+        stop_arrival[order] = arrival
+        self.departure_times[rows] = truck.departure_time.total_seconds()
+        self.delivery_times[rows] = stop_arrival[stop_of_row]
+        self.truck_ids[rows] = self.truck_id(truck)
+        self.statuses[rows] = STATUS_DELIVERED
+
+        visit_rank = np.empty(len(order), dtype=np.intp)
+        visit_rank[order] = np.arange(len(order))
+        truck.route = [int(package_id) for package_id in self.package_ids[rows[np.argsort(visit_rank[stop_of_row],
+                                                                                           kind="stable")]]]
+        truck.total_mileage += float(legs.sum())
+        last_delivery = datetime.timedelta(seconds=float(arrival[-1])) if len(arrival) else truck.departure_time
+        return truck.total_mileage, last_delivery
+
+    def status_codes(self, current_time):
+        # Returns the status code of every package at the given time without modifying the store
+        seconds = current_time.total_seconds()
+        delivery = self.delivery_times[:self.count]
+        departure = self.departure_times[:self.count]
+        codes = np.full(self.count, STATUS_AT_HUB, dtype=np.int8)
+        codes[departure <= seconds] = STATUS_EN_ROUTE  # NaN comparisons are False, so unrouted rows stay at hub
+        codes[delivery <= seconds] = STATUS_DELIVERED
+        return codes
+
+    def status_counts(self, current_time):
+        # Counts the packages at the hub, en route and delivered at the given time
+        counts = np.bincount(self.status_codes(current_time), minlength=STATUS_DELIVERED + 1)
+        return {"At Hub": int(counts[STATUS_AT_HUB]), "En Route": int(counts[STATUS_EN_ROUTE]),
+                "Delivered": int(counts[STATUS_DELIVERED])}
+
+    def late_packages(self):
+        # Returns the IDs of packages delivered after their deadline
+        late = self.delivery_times[:self.count] > self.deadlines[:self.count]
+        return self.package_ids[:self.count][late]
+
+
+class PackageView:
+    # A lightweight Package-compatible view over one row of a PackageStore
+    __slots__ = ("store", "row")
+
+    def __init__(self, store, row):
+        self.store = store
+        self.row = row
+
+    @property
+    def package_id(self):
+        return int(self.store.package_ids[self.row])
+
+    def address_fields(self):
+        return self.store.address_table[self.store.address_refs[self.row]]
+
+    def set_address_fields(self, address_fields):
+        # Points the package at a different address, e.g. after an address correction
+        self.store.address_refs[self.row] = self.store.address_ref(tuple(address_fields))
+        self.store.address_indices[self.row] = self.store.address_to_index[address_fields[0]]
+
+    @property
+    def delivery_address(self):
+        return self.address_fields()[0]
+
+    @property
+    def delivery_city(self):
+        return self.address_fields()[1]
+
+    @property
+    def delivery_state(self):
+        return self.address_fields()[2]
+
+    @property
+    def delivery_zip(self):
+        return self.address_fields()[3]
+
+    @property
+    def delivery_deadline(self):
+        deadline = self.store.deadlines[self.row]
+        return "EOD" if np.isinf(deadline) else format_time_of_day(deadline)
+
+    @property
+    def package_weight(self):
+        return f"{float(self.store.weights[self.row]):g} {WEIGHT_UNIT}"
+
+    @property
+    def special_notes(self):
+        return self.store.notes.get(self.row, "")
+
+    @property
+    def departure_time(self):
+        return seconds_to_timedelta(self.store.departure_times[self.row])
+
+    @departure_time.setter
+    def departure_time(self, value):
+        self.store.departure_times[self.row] = np.nan if value is None else value.total_seconds()
+
+    @property
+    def delivery_time(self):
+        return seconds_to_timedelta(self.store.delivery_times[self.row])
+
+    @delivery_time.setter
+    def delivery_time(self, value):
+        self.store.delivery_times[self.row] = np.nan if value is None else value.total_seconds()
+
+    @property
+    def loaded_truck(self):
+        truck_id = self.store.truck_ids[self.row]
+        return None if truck_id == NO_TRUCK else self.store.trucks[truck_id]
+
+    @loaded_truck.setter
+    def loaded_truck(self, truck):
+        self.store.truck_ids[self.row] = self.store.truck_id(truck)
+
+    @property
+    def status(self):
+        code = self.store.statuses[self.row]
+        truck = self.loaded_truck
+        truck_info = truck.truck_name if truck is not None else ""
+        if code == STATUS_DELIVERED:
+            return "Delivered"
+        if code == STATUS_EN_ROUTE:
+            return f"En Route in {truck_info}"
+        if code == STATUS_AT_HUB:
+            return f"At Hub in {truck_info}"
+        return "At Hub"
+
+    @status.setter
+    def status(self, value):
+        if value == "Delivered":
+            self.store.statuses[self.row] = STATUS_DELIVERED
+        elif value.startswith("En Route"):
+            self.store.statuses[self.row] = STATUS_EN_ROUTE
+        elif value.startswith("At Hub in"):
+            self.store.statuses[self.row] = STATUS_AT_HUB
+        else:
+            self.store.statuses[self.row] = STATUS_INITIAL
+
+    # Method to update the package's status based on the current time and prepare a status string
+    def get_status_str(self, current_time=None):
+        truck = self.loaded_truck
+        truck_info = truck.truck_name if truck is not None else ""
+        if current_time is not None:
+            self.store.statuses[self.row] = self.status_code_at(current_time)
+        return format_status_line(self, self.status, truck_info, self.address_fields())
+
+    def status_code_at(self, current_time):
+        # Returns the status code of this package at the given time
+        seconds = current_time.total_seconds()
+        if self.store.delivery_times[self.row] <= seconds:
+            return STATUS_DELIVERED
+        if self.store.departure_times[self.row] <= seconds:
+            return STATUS_EN_ROUTE
+        return STATUS_AT_HUB
+
+
+# Function to load package data from CSV into a columnar package store
+def load_package_store(package_path, address_to_index):
+    store = PackageStore(address_to_index)
+    with open(package_path, mode='r') as csvfile:
+        for package in csv.reader(csvfile):
+            store.insert(int(package[0]), package[1].strip(), package[2].strip(), package[3].strip(),
+                         package[4].strip(), package[5].strip(), package[6].strip(),
+                         ",".join(package[7:]).strip().strip("'"))
+    return store
@@ -0,0 +1,188 @@
+# Importable delivery planner
+# Nothing is read or computed at import time: data loads on first use and every route is computed on demand and
+# memoized. Heavy modules (NumPy and the routing engines) are imported inside the methods that need them, so
+# importing this module stays cheap for services that only need part of the pipeline.
+
+import datetime
+import os
+
+DATA_DIRECTORY = os.path.join(os.path.dirname(os.path.abspath(__file__)), "CSV")
+DISTANCE_PATH = os.path.join(DATA_DIRECTORY, "Address_Distance_Info.csv")
+ADDRESS_PATH = os.path.join(DATA_DIRECTORY, "Address_Info.csv")
+PACKAGE_PATH = os.path.join(DATA_DIRECTORY, "Package_Info.csv")
+HUB_ADDRESS = "4001 South 700 East"
+
+# Manually loaded trucks for the sample manifest: (capacity, speed, departure time, package IDs, name)
+DEFAULT_TRUCKS = (
+    # Truck #1 Priority: Packages with the earliest deadlines not affected by the delayed flight
+    (16, 18, datetime.timedelta(hours=8, minutes=0),
+     [1, 13, 14, 15, 16, 17, 19, 20, 21, 22, 29, 30, 31, 34, 37, 40], "Truck 1"),
+    # Truck #2 Priority: Packages delayed on the flight and specific truck 2 packages
+    (16, 18, datetime.timedelta(hours=9, minutes=5),
+     [2, 3, 4, 5, 6, 7, 8, 10, 11, 12, 18, 25, 28, 32, 36, 38], "Truck 2"),
+    # Truck #3 Priority: Remaining packages and package #9 after receiving updated address
+    (16, 18, datetime.timedelta(hours=10, minutes=20),
+     [9, 23, 24, 26, 27, 33, 35, 39], "Truck 3"),
+)
+
+# Package #9 is listed with the wrong address until the correct address is received at 10:20 a.m.
+DEFAULT_ADDRESS_CORRECTIONS = {
+    9: (datetime.timedelta(hours=10, minutes=20), ('300 State St', 'Salt Lake City', 'UT', '84103'))
+}
+
+
+class DeliveryPlanner:
+    def __init__(self, distance_path=DISTANCE_PATH, address_path=ADDRESS_PATH, package_path=PACKAGE_PATH,
+                 truck_specs=DEFAULT_TRUCKS, address_corrections=None, use_distance_cache=False,
+                 assign_automatically=False, driver_count=None, improve_routes=False, deadline_routing=False,
+                 shortest_paths=False):
+        # Only records the configuration, all loading and routing happens lazily
+        # truck_specs lists (capacity, speed, departure time, package IDs, name) for manually loaded trucks. With
+        # assign_automatically the package lists are ignored and the assignment solver builds the trips instead.
+        # With shortest_paths every engine routes on the shortest path closure of the CSV distances.
+        self.distance_path = distance_path
+        self.address_path = address_path
+        self.package_path = package_path
+        self.truck_specs = truck_specs
+        self.address_corrections = DEFAULT_ADDRESS_CORRECTIONS if address_corrections is None else address_corrections
+        self.use_distance_cache = use_distance_cache
+        self.assign_automatically = assign_automatically
+        self.driver_count = driver_count
+        self.improve_routes = improve_routes
+        self.deadline_routing = deadline_routing
+        self.shortest_paths = shortest_paths
+        self._distance_matrix = None
+        self._shortest_paths = None
+        self._address_maps = None
+        self._package_hash_map = None
+        self._trucks = None
+        self._routes = {}
+        self._lateness_reports = {}
+        self._status_timeline = None
+
+    @property
+    def distance_matrix(self):
+        # Load data into the Adjacency Matrix on first use
+        if self._distance_matrix is None:
+            if self.use_distance_cache:
+                from distance_cache import load_distance_matrix
+                self._distance_matrix = load_distance_matrix(self.distance_path)
+            else:
+                from data_loader import create_distance_matrix
+                self._distance_matrix = create_distance_matrix(self.distance_path)
+            if self.shortest_paths:
+                from shortest_paths import shortest_path_closure
+                self._shortest_paths = shortest_path_closure(self._distance_matrix)
+                self._distance_matrix = self._shortest_paths.distance_matrix
+        return self._distance_matrix
+
+    def shortest_path(self, address1, address2):
+        # Returns the addresses actually driven through between two addresses, both ends included
+        index1, index2 = self.address_to_index[address1], self.address_to_index[address2]
+        self.distance_matrix  # Builds the closure on first use
+        if self._shortest_paths is None:
+            return [address1] if index1 == index2 else [address1, address2]
+        index_to_address = {index: address for address, index in self.address_to_index.items()}
+        return [index_to_address[index] for index in self._shortest_paths.path(index1, index2)]
+
+    @property
+    def location_to_index(self):
+        return self.address_maps[0]
+
+    @property
+    def address_to_index(self):
+        return self.address_maps[1]
+
+    @property
+    def address_maps(self):
+        # Create the address + location index maps on first use
+        if self._address_maps is None:
+            from data_loader import create_address_map
+            self._address_maps = create_address_map(self.address_path)
+        return self._address_maps
+
+    @property
+    def package_hash_map(self):
+        # Load package data into the hash table on first use
+        if self._package_hash_map is None:
+            from data_loader import load_package
+            from hash import HashMap
+            package_hash_map = HashMap()
+            load_package(self.package_path, package_hash_map)
+            self._package_hash_map = package_hash_map
+        return self._package_hash_map
+
+    @property
+    def trucks(self):
+        # Create the truck objects on first use, either manually loaded or from the assignment solver
+        if self._trucks is None:
+            from truck import Truck
+            trucks = [Truck(capacity, speed, 0, HUB_ADDRESS, departure_time, list(package_ids), name)
+                      for capacity, speed, departure_time, package_ids, name in self.truck_specs]
+            if self.assign_automatically:
+                from assignment import assign_packages
+                correction_times = [correction_time for correction_time, _ in self.address_corrections.values()]
+                trucks = assign_packages(trucks, list(self.package_hash_map), self.package_hash_map,
+                                         self.address_to_index, self.distance_matrix, self.driver_count,
+                                         max(correction_times) if correction_times else None)
+            self._trucks = trucks
+        return self._trucks
+
+    def truck(self, truck_name):
+        # Returns the first truck (or trip) with the given name
+        for truck in self.trucks:
+            if truck.truck_name == truck_name:
+                return truck
+        raise KeyError(truck_name)
+
+    def route(self, truck):
+        # Routes one truck on first request and returns its (total mileage, last delivery time)
+        key = id(truck)
+        if key not in self._routes:
+            if self.deadline_routing:
+                from deadline_routing import deadline_nearest_algo
+                mileage, last_delivery_time, report = deadline_nearest_algo(
+                    truck, self.package_hash_map, self.address_to_index, self.distance_matrix)
+                result = (mileage, last_delivery_time)
+                self._lateness_reports[key] = report
+            else:
+                from routing import vectorized_nearest_algo
+                result = vectorized_nearest_algo(truck, self.package_hash_map, self.address_to_index,
+                                                 self.distance_matrix)
+            if self.improve_routes:
+                from local_search import improve_route
+                improve_route(truck, self.package_hash_map, self.address_to_index, self.distance_matrix)
+                result = (truck.total_mileage, max((self.package_hash_map.lookup(package_id).delivery_time
+                                                    for package_id in truck.route), default=truck.departure_time))
+                self._lateness_reports.pop(key, None)  # Moved stops may have changed which deadlines are met
+            self._routes[key] = result
+            self._status_timeline = None  # Delivery times changed, so the timeline must be rebuilt
+        return self._routes[key]
+
+    def routes(self):
+        # Routes every truck and returns their results in truck order
+        return [self.route(truck) for truck in self.trucks]
+
+    def lateness_report(self, truck):
+        # Routes the truck if needed and reports the packages it delivers after their deadlines
+        key = id(truck)
+        self.route(truck)
+        if key not in self._lateness_reports:
+            from deadline_routing import lateness_report
+            self._lateness_reports[key] = lateness_report(truck, self.package_hash_map)
+        return self._lateness_reports[key]
+
+    def total_mileage(self):
+        return sum(mileage for mileage, _ in self.routes())
+
+    @property
+    def status_timeline(self):
+        # Builds the status timeline once every truck has been routed
+        if self._status_timeline is None:
+            self.routes()
+            from timeline import StatusTimeline
+            self._status_timeline = StatusTimeline(self.package_hash_map.values(), self.address_corrections)
+        return self._status_timeline
+
+    def status_at(self, package_id, current_time):
+        return self.status_timeline.status_line(package_id, current_time)
@@ -0,0 +1,121 @@
+# Load test client for the status query server
+# Opens several concurrent connections, sends batched lookups of random package IDs and times, and reports the
+# throughput and the latency percentiles of the round trips as JSON.
+#
+# Usage: python query_load_test.py --spawn                      start a server on a free port and test it
+#        python query_load_test.py --port 8765 --connections 8 --batch 500 --requests 200
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import subprocess
+import sys
+import time
+from query_server import DEFAULT_HOST, DEFAULT_PORT, MAX_LINE_BYTES
+
+
+# Function to build one request with batch random (package ID, time) lookups
+def random_request(rng, request_id, batch, max_package_id):
+    queries = [[rng.randint(1, max_package_id), f"{rng.randint(8, 17):02d}:{rng.randint(0, 59):02d}"]
+               for _ in range(batch)]
+    return {"request_id": request_id, "queries": queries}
+
+
+# Coroutine running one connection's share of the requests and returning the round trip latencies
+async def run_connection(host, port, unix_path, requests, batch, max_package_id, seed):
+    if unix_path is not None:
+        reader, writer = await asyncio.open_unix_connection(unix_path, limit=MAX_LINE_BYTES)
+    else:
+        reader, writer = await asyncio.open_connection(host, port, limit=MAX_LINE_BYTES)
+    rng = random.Random(seed)
+    latencies = []
+    errors = 0
+    try:
+        for request_id in range(requests):
+            line = json.dumps(random_request(rng, request_id, batch, max_package_id)).encode() + b"\n"
+            start = time.perf_counter()
+            writer.write(line)
+            await writer.drain()
+            response = json.loads(await reader.readline())
+            latencies.append(time.perf_counter() - start)
+            if response.get("request_id") != request_id or len(response.get("results", ())) != batch:
+                errors += 1
+    finally:
+        writer.close()
+        await writer.wait_closed()
+    return latencies, errors
+
+
+# Function to read a latency percentile from a sorted list of latencies
+def percentile(sorted_values, fraction):
+    if not sorted_values:
+        return None
+    return sorted_values[min(len(sorted_values) - 1, int(fraction * len(sorted_values)))]
+
+
+async def run_load_test(host, port, unix_path, connections, requests, batch, max_package_id, seed):
+    start = time.perf_counter()
+    outcomes = await asyncio.gather(*(run_connection(host, port, unix_path, requests, batch, max_package_id,
+                                                     seed + connection)
+                                      for connection in range(connections)))
+    wall = time.perf_counter() - start
+    latencies = sorted(latency for connection_latencies, _ in outcomes for latency in connection_latencies)
+    lookups = len(latencies) * batch
+    return {
+        "connections": connections,
+        "requests": len(latencies),
+        "batch": batch,
+        "lookups": lookups,
+        "errors": sum(errors for _, errors in outcomes),
+        "wall_seconds": round(wall, 6),
+        "lookups_per_second": round(lookups / wall, 1) if wall else None,
+        "latency_ms": {name: round(percentile(latencies, fraction) * 1000, 3)
+                       for name, fraction in (("p50", 0.50), ("p90", 0.90), ("p99", 0.99), ("max", 1.0))}
+        if latencies else None,
+    }
+
+
+# Function to start a query server in a child process on a free port and wait until it is listening
+def spawn_server():
+    server_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), "query_server.py")
+    process = subprocess.Popen([sys.executable, server_path, "--port", "0"], stdout=subprocess.PIPE, text=True)
+    banner = process.stdout.readline()  # "Serving package status queries on host:port"
+    if not banner:
+        process.kill()
+        raise RuntimeError("Query server exited before it started listening")
+    host, port = banner.rsplit(" ", 1)[1].strip().rsplit(":", 1)
+    return process, host, int(port)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load test the package status query server")
+    parser.add_argument("--host", default=DEFAULT_HOST)
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--unix", help="connect to this Unix socket path instead of TCP")
+    parser.add_argument("--spawn", action="store_true", help="start a server on a free port for the test")
+    parser.add_argument("--connections", type=int, default=4)
+    parser.add_argument("--requests", type=int, default=100, help="requests sent by each connection")
+    parser.add_argument("--batch", type=int, default=1000, help="lookups per request")
+    parser.add_argument("--max-package-id", type=int, default=40, help="package IDs are drawn from 1 to this")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    process = None
+    host, port, unix_path = args.host, args.port, args.unix
+    if args.spawn:
+        process, host, port = spawn_server()
+        unix_path = None
+    try:
+        results = asyncio.run(run_load_test(host, port, unix_path, args.connections, args.requests, args.batch,
+                                            args.max_package_id, args.seed))
+    finally:
+        if process is not None:
+            process.terminate()
+            process.wait()
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,192 @@
+# Asyncio status query service
+# Answers "where is package X at time T" lookups over TCP or a Unix socket with one JSON object per line.
+# Every request can carry many lookups, and all answers come from an immutable snapshot taken after routing,
+# so connections never share mutable state and no lock is needed.
+#
+# Requests, one per line:
+#     {"request_id": 1, "queries": [[9, "10:25"], [6, "09:30"]]}      explicit (package ID, time) pairs
+#     {"request_id": 2, "package_ids": [1, 2, 3], "times": ["09:00", "12:00"]}   every ID at every time
+# Responses carry the request_id and one result per lookup, in request order:
+#     {"request_id": 1, "results": [{"package_id": 9, "time": "10:25", "status": "En Route in Truck 3", ...}]}
+#
+# Usage: python query_server.py --port 8765   or   python query_server.py --unix /tmp/wgups.sock
+
+import argparse
+import asyncio
+import copy
+import datetime
+import functools
+import json
+from hash import HashMap
+from package import format_status_line
+from timeline import StatusTimeline
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8765
+# Largest number of lookups accepted in one request, so a single line cannot tie the server up
+MAX_BATCH_QUERIES = 100000
+# Longest request line accepted, in bytes
+MAX_LINE_BYTES = 16 * 1024 * 1024
+# Answers memoized per (package ID, minute); the snapshot never changes, so they never go stale
+ANSWER_CACHE_SIZE = 65536
+
+
+# Function to parse an "HH:MM" time like the user interface accepts, raises ValueError otherwise
+def parse_query_time(time_str):
+    try:
+        hours, minutes = map(int, str(time_str).split(":"))
+    except ValueError:
+        raise ValueError(f"invalid time {time_str!r}, expected HH:MM") from None
+    if not (0 <= hours <= 23 and 0 <= minutes <= 59):
+        raise ValueError(f"invalid time {time_str!r}, expected HH:MM")
+    return hours * 60 + minutes
+
+
+# Function to format a timedelta as a 12-hour clock time, None stays None
+def format_clock(time_value):
+    if time_value is None:
+        return None
+    total_seconds = int(time_value.total_seconds())
+    hours, minutes = total_seconds // 3600, (total_seconds % 3600) // 60
+    return f"{hours % 12 if hours % 12 else 12}:{minutes:02d} {'AM' if hours < 12 else 'PM'}"
+
+
+class StatusSnapshot:
+    def __init__(self, packages, address_corrections=None):
+        # Copies every routed package so later changes to the live packages (re-planning, status queries through
+        # get_status_str) cannot change what the server answers
+        self.packages = HashMap()
+        for package in packages:
+            self.packages.insert(package.package_id, copy.copy(package))
+        self.timeline = StatusTimeline(self.packages.values(), address_corrections)
+        self.answer = functools.lru_cache(maxsize=ANSWER_CACHE_SIZE)(self.build_answer)
+
+    @classmethod
+    def from_planner(cls, planner):
+        # Routes the planner's trucks if needed and snapshots the result
+        planner.routes()
+        return cls(planner.package_hash_map.values(), planner.address_corrections)
+
+    def build_answer(self, package_id, minute):
+        # Status of one package at a minute past midnight, using the same rules as Package.get_status_str
+        package = self.packages.lookup(package_id)
+        if package is None:
+            return {"package_id": package_id, "error": "package not found"}
+        current_time = datetime.timedelta(minutes=minute)
+        status = self.timeline.status_at(package_id, current_time)
+        truck_name = self.timeline.truck_names[package_id]
+        address_fields = self.timeline.address_at(package_id, current_time)
+        return {
+            "package_id": package_id,
+            "status": "Delivered" if status == "Delivered" else status.split(" in ")[0],
+            "truck": truck_name or None,
+            "address": ", ".join(address_fields),
+            "deadline": package.delivery_deadline,
+            "delivery_time": format_clock(package.delivery_time) if status == "Delivered" else None,
+            "line": format_status_line(package, status, truck_name, address_fields),
+        }
+
+    def query(self, package_id, time_str):
+        # Answers one lookup, errors are reported in the result rather than raised
+        try:
+            minute = parse_query_time(time_str)
+        except ValueError as error:
+            return {"package_id": package_id, "time": time_str, "error": str(error)}
+        if isinstance(package_id, bool) or not isinstance(package_id, int):
+            return {"package_id": package_id, "time": time_str, "error": "package_id must be an integer"}
+        return dict(self.answer(package_id, minute), time=time_str)
+
+
+# Function to expand a decoded request into its (package ID, time) lookups, raises ValueError if it is malformed
+def request_queries(request):
+    if not isinstance(request, dict):
+        raise ValueError("request must be a JSON object")
+    if "queries" in request:
+        queries = request["queries"]
+        if not isinstance(queries, list) or not all(isinstance(query, list) and len(query) == 2
+                                                    for query in queries):
+            raise ValueError("queries must be a list of [package_id, time] pairs")
+    elif "package_ids" in request and "times" in request:
+        package_ids, times = request["package_ids"], request["times"]
+        if not isinstance(package_ids, list) or not isinstance(times, list):
+            raise ValueError("package_ids and times must be lists")
+        if len(package_ids) * len(times) > MAX_BATCH_QUERIES:
+            raise ValueError(f"at most {MAX_BATCH_QUERIES} lookups are allowed per request")
+        queries = [(package_id, time_str) for time_str in times for package_id in package_ids]
+    else:
+        raise ValueError("request needs either queries or package_ids and times")
+    if len(queries) > MAX_BATCH_QUERIES:
+        raise ValueError(f"at most {MAX_BATCH_QUERIES} lookups are allowed per request")
+    return queries
+
+
+# Function to answer one request line, always returns a response object
+def handle_request(snapshot, line):
+    try:
+        request = json.loads(line)
+        queries = request_queries(request)
+    except ValueError as error:  # json.JSONDecodeError is a ValueError
+        return {"error": str(error)}
+    response = {"results": [snapshot.query(package_id, time_str) for package_id, time_str in queries]}
+    if "request_id" in request:
+        response["request_id"] = request["request_id"]
+    return response
+
+
+# Coroutine serving one connection: reads request lines until the client closes and writes one response each
+async def serve_connection(snapshot, reader, writer):
+    try:
+        while True:
+            try:
+                line = await reader.readline()
+            except (asyncio.LimitOverrunError, ValueError):
+                writer.write(b'{"error": "request line too long"}\n')
+                break
+            if not line:
+                break
+            if not line.strip():
+                continue
+            writer.write(json.dumps(handle_request(snapshot, line)).encode() + b"\n")
+            await writer.drain()
+    except ConnectionError:
+        pass  # The client went away mid-response
+    finally:
+        writer.close()
+
+
+# Coroutine starting the server on a Unix socket when a path is given, otherwise on TCP
+async def start_query_server(snapshot, host=DEFAULT_HOST, port=DEFAULT_PORT, unix_path=None):
+    handler = functools.partial(serve_connection, snapshot)
+    if unix_path is not None:
+        return await asyncio.start_unix_server(handler, path=unix_path, limit=MAX_LINE_BYTES)
+    return await asyncio.start_server(handler, host=host, port=port, limit=MAX_LINE_BYTES)
+
+
+async def serve(snapshot, host, port, unix_path):
+    server = await start_query_server(snapshot, host, port, unix_path)
+    address = unix_path if unix_path is not None else "{}:{}".format(*server.sockets[0].getsockname()[:2])
+    print(f"Serving package status queries on {address}", flush=True)
+    async with server:
+        await server.serve_forever()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve package status queries as JSON lines")
+    parser.add_argument("--host", default=DEFAULT_HOST)
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT, help="TCP port, 0 picks a free one")
+    parser.add_argument("--unix", help="serve on this Unix socket path instead of TCP")
+    parser.add_argument("--assign", action="store_true", help="load the trucks with the assignment solver")
+    parser.add_argument("--deadline-routing", action="store_true", help="route with the deadline-aware engine")
+    args = parser.parse_args()
+
+    from planner import DeliveryPlanner
+    planner = DeliveryPlanner(assign_automatically=args.assign, deadline_routing=args.deadline_routing)
+    snapshot = StatusSnapshot.from_planner(planner)
+    try:
+        asyncio.run(serve(snapshot, args.host, args.port, args.unix))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,232 @@
+import bisect
+import datetime
+import numpy as np
+from distance_cache import as_distance_array
+from local_search import two_opt_or_opt
+from routing import resolve_stops, nearest_order
+
+# Local search budget spent on each re-planned route suffix, small enough to keep events in the millisecond range
+REPLAN_ITERATIONS = 200
+
+
+class AddressChangeEvent:
+    def __init__(self, package_id, event_time, address_fields):
+        # The package's (address, city, state, zip) became known or changed at event_time
+        self.package_id = package_id
+        self.event_time = event_time
+        self.address_fields = tuple(address_fields)
+
+
+class ArrivalEvent:
+    def __init__(self, package_ids, event_time):
+        # The packages reached the hub at event_time and can be loaded onto a truck that has not departed
+        self.package_ids = list(package_ids)
+        self.event_time = event_time
+
+
+class BreakdownEvent:
+    def __init__(self, truck_name, event_time):
+        # The truck stopped driving at event_time, its undelivered packages must go out on another truck
+        self.truck_name = truck_name
+        self.event_time = event_time
+
+
+class ReplanResult:
+    def __init__(self):
+        # Outcome of handling one event
+        self.replanned_trucks = []  # Names of the trucks whose remaining routes changed
+        self.unassigned = []  # Package IDs that no truck could take
+
+
+class TruckPlan:
+    def __init__(self, truck, package_hash_map, address_to_index, distance_matrix):
+        # Route of one truck as visited stops with arrival times, built from an already routed truck
+        self.truck = truck
+        self.broken_at = None
+        self.stop_indices = []  # Matrix index of each stop in visit order
+        self.stop_packages = []  # Packages delivered at each stop
+        self.arrivals = []  # Arrival time of each stop
+        self.miles = []  # Miles driven when arriving at each stop
+        visit_order = truck.route if truck.route else truck.initial_packages
+        stop_indices, stop_packages = resolve_stops(visit_order, package_hash_map, address_to_index)
+        hub_index = address_to_index[truck.current_location]
+        self.hub_index = hub_index
+        if truck.route:
+            # Routed trucks already carry delivery times, so stops keep their recorded order
+            self.rebuild(0, list(range(len(stop_indices))), stop_indices, stop_packages, distance_matrix)
+        else:
+            order = nearest_order(hub_index, stop_indices, distance_matrix)
+            self.rebuild(0, list(order), stop_indices, stop_packages, distance_matrix)
+
+    def frozen_stop_count(self, event_time):
+        # Stops already reached by event_time plus the stop the truck is currently driving towards
+        if event_time < self.truck.departure_time:
+            return 0
+        reached = bisect.bisect_right(self.arrivals, event_time)
+        return min(reached + 1, len(self.arrivals))
+
+    def anchor(self, frozen):
+        # Location, time and mileage from which the unfrozen part of the route starts
+        if frozen == 0:
+            return self.hub_index, self.truck.departure_time, 0.0
+        return self.stop_indices[frozen - 1], self.arrivals[frozen - 1], self.miles[frozen - 1]
+
+    def suffix_packages(self, frozen):
+        return [package for packages in self.stop_packages[frozen:] for package in packages]
+
+    def package_count(self):
+        return sum(len(packages) for packages in self.stop_packages)
+
+    def rebuild(self, frozen, order, stop_indices, stop_packages, distance_matrix):
+        # Replaces every stop after the frozen prefix with the given stops in the given order
+        # and recomputes arrival times, mileage and the packages' delivery details
+        location, arrival, miles = self.anchor(frozen)
+        del self.stop_indices[frozen:], self.stop_packages[frozen:], self.arrivals[frozen:], self.miles[frozen:]
+        hours_per_mile = 1 / self.truck.avg_speed
+        for position in order:
+            stop_index = int(stop_indices[position])
+            leg = float(distance_matrix[location, stop_index])
+            miles += leg
+            arrival += datetime.timedelta(hours=leg * hours_per_mile)
+            for package in stop_packages[position]:
+                package.departure_time = self.truck.departure_time
+                package.loaded_truck = self.truck
+                package.delivery_time = arrival
+                package.status = 'Delivered'
+            self.stop_indices.append(stop_index)
+            self.stop_packages.append(list(stop_packages[position]))
+            self.arrivals.append(arrival)
+            self.miles.append(miles)
+            location = stop_index
+        self.truck.total_mileage = self.miles[-1] if self.miles else 0.0
+        self.truck.route = [package.package_id for packages in self.stop_packages for package in packages]
+        self.truck.initial_packages = list(self.truck.route)
+
+
+class DispatchPlanner:
+    def __init__(self, trucks, package_hash_map, address_to_index, distance_matrix,
+                 replan_iterations=REPLAN_ITERATIONS):
+        # Holds the live plan for a routed fleet and re-plans only what an event touches
+        self.package_hash_map = package_hash_map
+        self.address_to_index = address_to_index
+        self.distance_matrix = as_distance_array(distance_matrix)
+        self.replan_iterations = replan_iterations
+        self.plans = {truck.truck_name: TruckPlan(truck, package_hash_map, address_to_index, self.distance_matrix)
+                      for truck in trucks}
+        # Which truck currently carries each package
+        self.carrier = {package.package_id: plan for plan in self.plans.values()
+                        for packages in plan.stop_packages for package in packages}
+
+    def handle(self, event):
+        # Dispatches an event to its handler and returns a ReplanResult
+        if isinstance(event, AddressChangeEvent):
+            return self.address_changed(event.package_id, event.event_time, event.address_fields)
+        if isinstance(event, ArrivalEvent):
+            return self.packages_arrived(event.package_ids, event.event_time)
+        if isinstance(event, BreakdownEvent):
+            return self.truck_breakdown(event.truck_name, event.event_time)
+        raise TypeError(f"Unsupported event type: {type(event).__name__}")
+
+    def replan(self, plan, event_time, added=(), removed_ids=()):
+        # Re-optimizes the part of a truck's route that has not been driven by event_time
+        frozen = plan.frozen_stop_count(event_time)
+        if removed_ids:
+            # Packages can also leave stops the truck is already committed to, the stop itself stays
+            plan.stop_packages[:frozen] = [[package for package in packages if package.package_id not in removed_ids]
+                                           for packages in plan.stop_packages[:frozen]]
+        remaining = [package.package_id for package in plan.suffix_packages(frozen)
+                     if package.package_id not in removed_ids]
+        remaining.extend(package_id for package_id in added)
+        stop_indices, stop_packages = resolve_stops(remaining, self.package_hash_map, self.address_to_index)
+        anchor_index = plan.anchor(frozen)[0]
+
+        order = nearest_order(anchor_index, stop_indices, self.distance_matrix)
+        if len(order) > 2 and self.replan_iterations:
+            path = np.concatenate(([anchor_index], stop_indices[order]))
+            refined, _ = two_opt_or_opt(path, self.distance_matrix, self.replan_iterations)
+            order = order[refined[1:] - 1]
+        plan.rebuild(frozen, list(order), stop_indices, stop_packages, self.distance_matrix)
+
+    def release(self, package_ids):
+        # Clears the delivery details of packages that are no longer on any truck
+        for package_id in package_ids:
+            package = self.package_hash_map.lookup(package_id)
+            package.departure_time = None
+            package.delivery_time = None
+            package.loaded_truck = None
+            package.status = "At Hub"
+            self.carrier.pop(package_id, None)
+
+    def address_changed(self, package_id, event_time, address_fields):
+        # Updates a package's address and re-plans the remaining route of the truck carrying it
+        result = ReplanResult()
+        package = self.package_hash_map.lookup(package_id)
+        if package is None:
+            raise ValueError(f"Package ID {package_id} not found")
+        if address_fields[0] not in self.address_to_index:
+            raise ValueError(f"Unknown delivery address {address_fields[0]!r}")
+        if package.delivery_time is not None and package.delivery_time <= event_time:
+            raise ValueError(f"Package ID {package_id} was already delivered at {package.delivery_time}")
+        package.set_address_fields(address_fields)
+
+        plan = self.carrier.get(package_id)
+        if plan is not None:
+            self.replan(plan, event_time, added=[package_id], removed_ids={package_id})
+            result.replanned_trucks.append(plan.truck.truck_name)
+        return result
+
+    def packages_arrived(self, package_ids, event_time, exclude=None):
+        # Loads packages that reached the hub onto trucks that have not departed yet
+        # Each package goes to the truck with a stop closest to its address and room left
+        result = ReplanResult()
+        candidates = [plan for plan in self.plans.values()
+                      if plan is not exclude and plan.broken_at is None and plan.truck.departure_time >= event_time]
+        loads = {id(plan): plan.package_count() for plan in candidates}
+        additions = {}
+        for package_id in package_ids:
+            package = self.package_hash_map.lookup(package_id)
+            if package is None:
+                raise ValueError(f"Package ID {package_id} not found")
+            if package_id in self.carrier:
+                raise ValueError(f"Package ID {package_id} is already loaded on "
+                                 f"{self.carrier[package_id].truck.truck_name}")
+            target = self.address_to_index[package.delivery_address]
+            best_plan, best_distance = None, None
+            for plan in candidates:
+                if loads[id(plan)] >= plan.truck.max_capacity:
+                    continue
+                stops = [plan.hub_index] + plan.stop_indices
+                distance = float(np.min(self.distance_matrix[target, np.asarray(stops, dtype=np.intp)]))
+                if best_distance is None or distance < best_distance:
+                    best_plan, best_distance = plan, distance
+            if best_plan is None:
+                result.unassigned.append(package_id)
+                continue
+            loads[id(best_plan)] += 1
+            additions.setdefault(id(best_plan), (best_plan, []))[1].append(package_id)
+
+        for plan, added in additions.values():
+            self.replan(plan, event_time, added=added)
+            for package_id in added:
+                self.carrier[package_id] = plan
+            result.replanned_trucks.append(plan.truck.truck_name)
+        self.release(result.unassigned)
+        return result
+
+    def truck_breakdown(self, truck_name, event_time):
+        # Stops a truck where it is and hands its undelivered packages to trucks that have not departed
+        plan = self.plans[truck_name]
+        plan.broken_at = event_time
+        if event_time < plan.truck.departure_time:
+            delivered = 0
+        else:
+            delivered = bisect.bisect_right(plan.arrivals, event_time)
+        stranded = [package.package_id for package in plan.suffix_packages(delivered)]
+        # Keep only the stops completed before the breakdown
+        plan.rebuild(delivered, [], [], [], self.distance_matrix)
+        self.release(stranded)
+
+        # The stranded packages are treated as arriving back at the hub at the time of the breakdown
+        result = self.packages_arrived(stranded, event_time, exclude=plan)
+        result.replanned_trucks.insert(0, truck_name)
+        return result
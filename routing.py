@@ -0,0 +1,130 @@
+import datetime
+import numpy as np
+from distance_cache import as_distance_array
+
+
+# Function to resolve a truck's packages into delivery stops
+# Every package is mapped to its distance matrix index once, and packages sharing an address are grouped
+# into a single stop. Stops keep the order in which their first package appears in the truck's package list.
+def resolve_stops(package_ids, package_hash_map, address_to_index):
+    stop_position = {}  # Maps a matrix index to its position in the stop arrays
+    stop_indices = []  # Matrix index of each stop
+    stop_packages = []  # Packages delivered at each stop
+    for package_id in package_ids:
+        package = package_hash_map.lookup(package_id)
+        matrix_index = address_to_index[package.delivery_address]
+        position = stop_position.get(matrix_index)
+        if position is None:
+            # First package seen for this address, so open a new stop
+            position = len(stop_indices)
+            stop_position[matrix_index] = position
+            stop_indices.append(matrix_index)
+            stop_packages.append([])
+        stop_packages[position].append(package)
+    return np.array(stop_indices, dtype=np.intp), stop_packages
+
+
+# Function to order stops with the nearest neighbor heuristic
+# Each step takes one row of the distance matrix restricted to the stops and picks the closest unvisited stop
+# with a single vectorized argmin. Visited stops are masked with infinity, and ties resolve to the earliest stop
+# just like min() over the package dictionary does.
+def nearest_order(start_index, stop_indices, distance_matrix):
+    stop_count = len(stop_indices)
+    order = np.empty(stop_count, dtype=np.intp)
+    # Pull out the sub matrix between the stops once so each step is a contiguous row lookup
+    distance = as_distance_array(distance_matrix)
+    stop_matrix = np.asarray(distance[np.ix_(stop_indices, stop_indices)], dtype=np.float64)
+    remaining = np.array(distance[start_index, stop_indices], dtype=np.float64)
+    visited = np.zeros(stop_count, dtype=bool)
+
+    for step in range(stop_count):
+        nearest = int(np.argmin(remaining))
+        order[step] = nearest
+        visited[nearest] = True
+        # Load the row for the new location and hide every stop that has already been visited
+        remaining = np.where(visited, np.inf, stop_matrix[nearest])
+    return order
+
+
+# Function to drive a truck along an ordered list of stops
+# Updates the truck's mileage and every package's departure time, delivery time and status
+def apply_route(truck, route, stop_packages, start_index, stop_indices, distance_matrix):
+    departure_datetime = truck.departure_time  # Start time for the delivery route
+    hours_per_mile = 1 / truck.avg_speed
+    current_location_index = start_index
+    truck.route = []
+
+    for position in route:
+        stop_index = int(stop_indices[position])
+        stop_distance = distance_matrix[current_location_index, stop_index]
+        truck.total_mileage += stop_distance  # Update the truck's total mileage
+
+        # Calculate the travel time to reach the stop
+        departure_datetime += datetime.timedelta(hours=(stop_distance * hours_per_mile))
+
+        # Every package at the stop is delivered at the same time
+        for package in stop_packages[position]:
+            package.departure_time = truck.departure_time
+            package.loaded_truck = truck
+            package.delivery_time = departure_datetime
+            package.status = 'Delivered'
+            truck.route.append(package.package_id)
+        current_location_index = stop_index
+
+    # Return the truck's total mileage and the last delivery time
+    return truck.total_mileage, departure_datetime
+
+
+# This function is a vectorized drop-in replacement for nearest_algo
+# It produces the same route, mileage and delivery times while doing the per-step work in NumPy
+def vectorized_nearest_algo(truck, package_hash_map, address_to_index, distance_matrix):
+    stop_indices, stop_packages = resolve_stops(truck.initial_packages, package_hash_map, address_to_index)
+    start_index = address_to_index[truck.current_location]
+    route = nearest_order(start_index, stop_indices, distance_matrix)
+    return apply_route(truck, route, stop_packages, start_index, stop_indices, distance_matrix)
+
+
+# This function applies the nearest neighbor algorithm to determine the optimal delivery route for the trucks
+def nearest_algo(truck, package_hash_map, address_to_index, distance_matrix):
+    departure_datetime = truck.departure_time  # Start time for the delivery route
+
+    # Update the departure time for all packages loaded on to the trucks
+    for package_id in truck.initial_packages:
+        package = package_hash_map.lookup(package_id)
+        package.departure_time = departure_datetime
+        package.loaded_truck = truck  # Set the loaded_truck attribute
+
+    # Initializes a dictionary of packages yet to be delivered
+    not_delivered = {package_id: package_hash_map.lookup(package_id) for package_id in truck.initial_packages}
+    current_location_index = address_to_index[truck.current_location]
+    hours_per_mile = 1 / 18
+
+    # Loop until all packages have been delivered
+    while not_delivered:
+        # Find the nearest package to the current location
+        nearest_package_id, nearest_package = min(
+            not_delivered.items(),
+            key=lambda item: distance_matrix[current_location_index][address_to_index[item[1].delivery_address]]
+        )
+
+        # Calculate the distance to the nearest package
+        nearest_package_distance = distance_matrix[current_location_index][
+            address_to_index[nearest_package.delivery_address]]
+        truck.total_mileage += nearest_package_distance  # Update the truck's total mileage
+
+        # Calculate the travel time to deliver the nearest package.
+        travel_time = datetime.timedelta(hours=(nearest_package_distance * hours_per_mile))
+        departure_datetime += travel_time
+
+        # Update the package's delivery time and status
+        nearest_package.delivery_time = departure_datetime
+        nearest_package.status = 'Delivered'
+        truck.route.append(nearest_package_id)  # Record the visit order for later route improvement
+
+        # Remove the delivered package from the list of packages to be delivered
+        not_delivered.pop(nearest_package_id)
+        # Update the truck's current location to the location of the delivered package
+        current_location_index = address_to_index[nearest_package.delivery_address]
+
+    # Return the truck's total mileage and the last delivery time
+    return truck.total_mileage, departure_datetime
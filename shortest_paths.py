@@ -0,0 +1,144 @@
+from collections import OrderedDict
+import numpy as np
+from distance_cache import LazyDistanceMatrix, as_distance_array
+
+# Networks up to this many addresses get the full Floyd-Warshall closure, larger ones compute rows on demand
+FLOYD_WARSHALL_MAX_SIZE = 500
+# Shortest path rows kept by the on-demand closure before the least recently used row is dropped
+DEFAULT_CACHED_ROWS = 256
+# A path through an intermediate address must be shorter by more than this many miles to replace the direct leg,
+# which keeps float32 rounding in packed caches from inventing detours
+PATH_EPSILON = 1e-6
+
+
+# Function to compute all pairs shortest paths with Floyd-Warshall
+# Each intermediate address k is relaxed for every pair at once with a broadcast (n, n) comparison.
+# next_hop[i, j] is the first address to drive to on the shortest path from i to j.
+def floyd_warshall(distance_matrix):
+    distance = as_distance_array(distance_matrix)
+    size = len(distance)
+    everything = np.arange(size)
+    shortest = np.array(distance[np.ix_(everything, everything)], dtype=np.float64)
+    next_hop = np.tile(everything, (size, 1))  # Without detours every address is driven to directly
+    # Scratch arrays reused across the relaxations so the loop does not allocate (n, n) temporaries
+    via = np.empty_like(shortest)
+    threshold = np.empty_like(shortest)
+    shorter = np.empty(shortest.shape, dtype=bool)
+    for k in range(size):
+        np.add(shortest[:, k, None], shortest[None, k, :], out=via)
+        np.subtract(shortest, PATH_EPSILON, out=threshold)
+        np.less(via, threshold, out=shorter)
+        np.copyto(shortest, via, where=shorter)
+        np.copyto(next_hop, next_hop[:, k, None], where=shorter)
+    return shortest, next_hop
+
+
+# Function to compute the shortest distances from one address to every other with Dijkstra's algorithm
+# The road graph is complete, so the array form is used: each step settles the closest unsettled address with an
+# argmin and relaxes its whole matrix row at once. predecessors[j] is the address visited just before j.
+def dijkstra_row(distance_matrix, source):
+    distance = as_distance_array(distance_matrix)
+    size = len(distance)
+    shortest = np.full(size, np.inf)
+    shortest[source] = 0.0
+    predecessors = np.full(size, -1, dtype=np.intp)
+    frontier = shortest.copy()  # Tentative distances with settled addresses hidden behind infinity
+    settled = np.zeros(size, dtype=bool)
+    for _ in range(size):
+        closest = int(np.argmin(frontier))
+        if frontier[closest] == np.inf:
+            break
+        settled[closest] = True
+        frontier[closest] = np.inf
+        candidate = shortest[closest] + np.asarray(distance[closest], dtype=np.float64)
+        shorter = (candidate < shortest - PATH_EPSILON) & ~settled
+        shortest[shorter] = candidate[shorter]
+        frontier[shorter] = candidate[shorter]
+        predecessors[shorter] = closest
+    return shortest, predecessors
+
+
+class DenseShortestPaths:
+    def __init__(self, distance_matrix):
+        # Full shortest path closure of a small network, computed once up front
+        self.distance_matrix, self.next_hop = floyd_warshall(distance_matrix)
+        self.size = len(self.distance_matrix)
+
+    def path(self, i, j):
+        # Returns the addresses driven through from i to j, both ends included
+        path = [int(i)]
+        while path[-1] != j:
+            path.append(int(self.next_hop[path[-1], j]))
+        return path
+
+
+class LazyShortestPaths(LazyDistanceMatrix):
+    def __init__(self, distance_matrix, max_cached_rows=DEFAULT_CACHED_ROWS):
+        # Shortest path closure of a large network, computed one source row at a time with Dijkstra's algorithm
+        # The most recently used rows are kept with their predecessor tables in an LRU cache
+        self.base = as_distance_array(distance_matrix)
+        self.size = len(self.base)
+        self.shape = (self.size, self.size)
+        self.ndim = 2
+        self.max_cached_rows = max(1, max_cached_rows)
+        self.rows = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def distance_matrix(self):
+        # The closure is itself the distance matrix the routing engines index
+        return self
+
+    def shortest_row(self, i):
+        # Returns (distances, predecessors) for source i from the cache, computing them on a miss
+        i = int(i)
+        entry = self.rows.get(i)
+        if entry is not None:
+            self.hits += 1
+            self.rows.move_to_end(i)
+            return entry
+        self.misses += 1
+        entry = dijkstra_row(self.base, i)
+        self.rows[i] = entry
+        if len(self.rows) > self.max_cached_rows:
+            self.rows.popitem(last=False)  # Drop the least recently used row
+        return entry
+
+    def row(self, i):
+        return self.shortest_row(i)[0]
+
+    def __getitem__(self, key):
+        # Supports matrix[i][j], matrix[i, j] and NumPy style fancy indexing such as matrix[np.ix_(rows, cols)]
+        # Distances are symmetric, so each lookup runs Dijkstra from whichever side has fewer distinct addresses
+        if isinstance(key, tuple):
+            rows, cols = np.broadcast_arrays(np.asarray(key[0], dtype=np.intp), np.asarray(key[1], dtype=np.intp))
+            if len(np.unique(cols)) < len(np.unique(rows)):
+                rows, cols = cols, rows
+            sources, positions = np.unique(rows, return_inverse=True)
+            table = np.stack([self.row(source) for source in sources]) if len(sources) else np.empty((0, self.size))
+            values = table[positions.reshape(rows.shape), cols]
+            return float(values) if values.ndim == 0 else values
+        if np.ndim(key) == 0:
+            return self.row(key)
+        return np.stack([self.row(i) for i in np.asarray(key).ravel()]) if len(key) else np.empty((0, self.size))
+
+    def path(self, i, j):
+        # Returns the addresses driven through from i to j, both ends included
+        predecessors = self.shortest_row(i)[1]
+        path = [int(j)]
+        while path[-1] != i:
+            path.append(int(predecessors[path[-1]]))
+        return path[::-1]
+
+
+# Function to build the shortest path closure of a distance matrix
+# The CSV distances do not always satisfy the triangle inequality, so driving via another address can be shorter
+# than the listed leg. Small networks get the full Floyd-Warshall closure, large ones a LazyShortestPaths that
+# runs Dijkstra per source row on demand. The result's distance_matrix can be passed to any routing engine in
+# place of the raw matrix, and path(i, j) reconstructs the addresses a leg actually drives through.
+def shortest_path_closure(distance_matrix, max_dense_size=FLOYD_WARSHALL_MAX_SIZE,
+                          max_cached_rows=DEFAULT_CACHED_ROWS):
+    if len(distance_matrix) <= max_dense_size:
+        return DenseShortestPaths(distance_matrix)
+    return LazyShortestPaths(distance_matrix, max_cached_rows)
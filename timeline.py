@@ -0,0 +1,95 @@
+from bisect import bisect_right
+from package import format_status_line
+
+# Event kinds recorded on the timeline
+DEPARTED = "Departed"
+DELIVERED = "Delivered"
+ADDRESS_CORRECTED = "Address Corrected"
+
+
+# Function to convert a timedelta (or None) into seconds for the sorted event arrays
+def to_seconds(time_value):
+    return None if time_value is None else time_value.total_seconds()
+
+
+class StatusTimeline:
+    def __init__(self, packages, address_corrections=None):
+        # Precomputes every status change once after routing so queries never touch the Package objects' state
+        # address_corrections maps a package ID to (correction time, (address, city, state, zip)), where the
+        # address fields are the ones listed for the package before the correction is received
+        self.packages = {}
+        self.truck_names = {}
+        self.corrections = dict(address_corrections or {})
+        events = []
+        departures = []
+        deliveries = []
+
+        for package in packages:
+            self.packages[package.package_id] = package
+            self.truck_names[package.package_id] = package.loaded_truck.truck_name if package.loaded_truck else ""
+            departure = to_seconds(package.departure_time)
+            delivery = to_seconds(package.delivery_time)
+            if departure is not None:
+                departures.append(departure)
+                events.append((departure, package.package_id, DEPARTED))
+            if delivery is not None:
+                deliveries.append(delivery)
+                events.append((delivery, package.package_id, DELIVERED))
+        for package_id, (correction_time, _) in self.corrections.items():
+            events.append((to_seconds(correction_time), package_id, ADDRESS_CORRECTED))
+
+        # Sorted arrays that each query bisects
+        self.departures = sorted(departures)
+        self.deliveries = sorted(deliveries)
+        self.events = sorted(events, key=lambda event: (event[0], event[1]))
+        self.event_times = [event[0] for event in self.events]
+
+    def status_counts(self, current_time):
+        # Returns how many packages are at the hub, en route and delivered at the given time in O(log n)
+        seconds = current_time.total_seconds()
+        departed = bisect_right(self.departures, seconds)
+        delivered = bisect_right(self.deliveries, seconds)
+        return {
+            "At Hub": len(self.packages) - departed,
+            "En Route": departed - delivered,  # A package is always delivered after it departs
+            "Delivered": delivered,
+        }
+
+    def changes_between(self, start_time, end_time):
+        # Returns the (seconds, package ID, event) entries after start_time up to and including end_time
+        # in O(log n + k), where k is the number of events in the window
+        first = bisect_right(self.event_times, start_time.total_seconds())
+        last = bisect_right(self.event_times, end_time.total_seconds())
+        return self.events[first:last]
+
+    def changes_until(self, end_time):
+        # Returns every event up to and including end_time
+        return self.events[:bisect_right(self.event_times, end_time.total_seconds())]
+
+    def status_at(self, package_id, current_time):
+        # Returns the status the package has at the given time, using the same rules as Package.get_status_str
+        package = self.packages[package_id]
+        truck_info = self.truck_names[package_id]
+        if package.delivery_time and current_time >= package.delivery_time:
+            return "Delivered"
+        elif package.departure_time and current_time >= package.departure_time:
+            return f"En Route in {truck_info}"
+        return f"At Hub in {truck_info}"
+
+    def address_at(self, package_id, current_time):
+        # Returns the (address, city, state, zip) listed for the package at the given time
+        correction = self.corrections.get(package_id)
+        if correction is not None and current_time < correction[0]:
+            return correction[1]
+        package = self.packages[package_id]
+        return package.delivery_address, package.delivery_city, package.delivery_state, package.delivery_zip
+
+    def status_line(self, package_id, current_time):
+        # Builds the same status line as Package.get_status_str without modifying the package
+        return format_status_line(self.packages[package_id], self.status_at(package_id, current_time),
+                                  self.truck_names[package_id], self.address_at(package_id, current_time))
+
+    def report(self, current_time):
+        # Builds the status line of every package at the given time
+        return [self.status_line(package_id, current_time) for package_id in self.packages]
+
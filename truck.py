@@ -9,4 +9,5 @@ class Truck:
         self.initial_packages = initial_packages
         self.departure_time = departure_time
         self.truck_name = truck_name
+        self.route = []  # Package IDs in the order they were delivered
 